@@ -1,3 +1,4 @@
 from app.agents.research_agent import ResearchAgent
+from app.agents.context_builder import ContextBuilder
 
-__all__ = ["ResearchAgent"]
+__all__ = ["ResearchAgent", "ContextBuilder"]
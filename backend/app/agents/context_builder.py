@@ -0,0 +1,165 @@
+import asyncio
+import time
+from typing import Optional
+from uuid import UUID
+from anthropic import AsyncAnthropic
+from app.clients import get_anthropic_client
+from app.config import get_settings
+from app.database import async_session_maker
+from app.services.chat_service import ChatService
+from app.services.metrics import ANTHROPIC_LATENCY, record_usage
+from app.services.retry import call_with_retry
+
+settings = get_settings()
+
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a research assistant.
+
+Update the existing summary with the new messages below. Keep facts, figures, names, conclusions, open questions and any sources the assistant cited. Drop pleasantries and repetition. Write compact prose of at most a few paragraphs and reply with the updated summary only."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token)."""
+    return len(text) // 4 + 4
+
+
+class ContextBuilder:
+    """Builds a token-budgeted conversation history for the agent.
+
+    Recent messages are kept verbatim. After a turn, once the unsummarized
+    history has grown past ``context_token_budget``, ``fold`` folds the
+    oldest messages into a rolling summary stored on the chat, until what
+    remains fits in ``context_recent_token_target``. Folding runs in the
+    background on the small model and only ever processes messages that have
+    not been summarized yet, so building the next turn's context never waits
+    for a summarization.
+
+    Each read and write uses its own short-lived session, so no database
+    connection is held while the summary is generated.
+    """
+
+    def __init__(
+        self,
+        client: Optional[AsyncAnthropic] = None,
+        session_maker=async_session_maker,
+    ):
+        self.client = client or get_anthropic_client()
+        self.session_maker = session_maker
+        self.model = settings.summary_model
+
+    async def build(self, chat_id: UUID) -> tuple[Optional[str], list[dict]]:
+        """Return ``(summary, message_history)`` for the next agent turn.
+
+        If a fold is still running or has failed, only the newest messages
+        that fit in ``context_token_budget`` are sent, so the context stays
+        bounded either way.
+        """
+        summary, messages = await self._load(chat_id)
+        sizes = [estimate_tokens(msg.content) for msg in messages]
+        if sum(sizes) > settings.context_token_budget:
+            messages = messages[
+                self._window_start(messages, sizes, settings.context_token_budget):
+            ]
+
+        # Runs aborted before any text was written leave an empty reply
+        history = [
+            {"role": msg.role, "content": msg.content}
+            for msg in messages
+            if msg.content
+        ]
+        return summary, history
+
+    async def fold(self, chat_id: UUID) -> None:
+        """Fold the oldest unsummarized messages into the summary if over budget."""
+        summary, messages = await self._load(chat_id)
+        sizes = [estimate_tokens(msg.content) for msg in messages]
+        if sum(sizes) <= settings.context_token_budget:
+            return
+
+        keep_from = self._window_start(
+            messages, sizes, settings.context_recent_token_target
+        )
+        folded = messages[:keep_from]
+        if not folded:
+            return
+        new_summary = await self._summarize(summary, folded)
+        if new_summary is None:
+            return
+        async with self.session_maker() as db:
+            await ChatService(db).update_chat_summary(
+                chat_id, new_summary, folded[-1].sequence_num
+            )
+            await db.commit()
+
+    async def _load(self, chat_id: UUID) -> tuple[Optional[str], list]:
+        """The chat's summary and the messages it does not cover yet."""
+        async with self.session_maker() as db:
+            service = ChatService(db)
+            summary, through_seq = await service.get_chat_summary(chat_id)
+            messages = await service.get_chat_messages(
+                chat_id, after_sequence=through_seq
+            )
+        return summary, messages
+
+    @staticmethod
+    def _window_start(messages: list, sizes: list[int], target: int) -> int:
+        """Index where the newest messages fitting in ``target`` tokens start."""
+        keep_from = len(messages)
+        kept = 0
+        while keep_from > 0 and kept + sizes[keep_from - 1] <= target:
+            keep_from -= 1
+            kept += sizes[keep_from]
+        # The verbatim window must start with a user turn
+        while 0 < keep_from < len(messages) and messages[keep_from].role != "user":
+            keep_from -= 1
+        return keep_from
+
+    async def _summarize(self, summary: Optional[str], messages: list) -> Optional[str]:
+        """Fold messages into the existing summary, or None if that fails."""
+        transcript = "\n\n".join(
+            f"{msg.role.upper()}: {msg.content}" for msg in messages
+        )
+        prompt = (
+            f"Existing summary:\n{summary or '(none yet)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        started = time.perf_counter()
+        try:
+            response = await call_with_retry(
+                "anthropic",
+                lambda: self.client.messages.create(
+                    model=self.model,
+                    max_tokens=settings.summary_max_tokens,
+                    system=SUMMARY_PROMPT,
+                    messages=[{"role": "user", "content": prompt}],
+                ),
+            )
+        except Exception as e:
+            print(f"Summary error: {e}")
+            return None
+        ANTHROPIC_LATENCY.labels(self.model, "summary").observe(time.perf_counter() - started)
+        record_usage(response)
+
+        for block in response.content:
+            if hasattr(block, "text"):
+                return block.text
+        return None
+
+
+# Background folds by chat, so a chat is never folded twice at once
+_folds: dict[UUID, asyncio.Task] = {}
+
+
+def schedule_fold(chat_id: UUID):
+    """Fold a chat's history in the background after a turn is persisted."""
+    if chat_id in _folds:
+        return
+    task = asyncio.create_task(ContextBuilder().fold(chat_id))
+    _folds[chat_id] = task
+    task.add_done_callback(lambda t: _fold_done(chat_id, t))
+
+
+def _fold_done(chat_id: UUID, task: asyncio.Task):
+    _folds.pop(chat_id, None)
+    if not task.cancelled() and task.exception():
+        print(f"Summary fold failed for chat {chat_id}: {task.exception()}")
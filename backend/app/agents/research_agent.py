@@ -1,19 +1,83 @@
+import asyncio
 import json
+import time
 import httpx
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Awaitable, Optional
 from anthropic import AsyncAnthropic
+from app.agents.sources import SourceCollector
+from app.clients import get_anthropic_client, get_http_client
 from app.config import get_settings
 from app.models.schemas import ThinkingStep, Source
+from app.services.search_cache import make_cache_key, search_cache
+from app.services.answer_cache import CachedAnswer, answer_cache, jaccard, question_tokens
+from app.services.metrics import (
+    ANTHROPIC_LATENCY,
+    PLANNING_DECISIONS,
+    SPECULATIVE_SEARCHES,
+    TAVILY_LATENCY,
+    TOOL_CALLS,
+    TOOL_CALLS_PER_ANSWER,
+    record_error,
+    record_usage,
+)
+from app.services.retry import call_with_retry, pacers, retry_delay
+from app.services.single_flight import SingleFlight
 
 settings = get_settings()
 
+# Tavily parameters that affect results, and therefore the cache key
+SEARCH_PARAMS = {"search_depth": "advanced", "max_results": 5}
+
+# Shared across agents so concurrent chats coalesce identical searches
+search_flight = SingleFlight()
+
+# Outcomes of speculative searches: used by a tool call, finished but
+# unused, or cancelled before finishing
+speculation_stats = {"started": 0, "hit": 0, "unused": 0, "cancelled": 0}
+
+PLANNING_PROMPT = """Before answering, decide whether web searches are needed. If they are, call web_search now, several times at once if the question has several parts. If not, reply with only the word NONE."""
+
+TITLE_PROMPT = """Write a short title of at most six words for a chat that starts with the user's message. Reply with the title only, without quotes."""
+
+
+def _usage_event(response, duration_ms: int, stage: str) -> dict:
+    """Build a usage event for one Claude call, including prompt cache tokens.
+
+    ``stage`` is ``planning`` for the routed planning turn, else ``answer``.
+    """
+    usage = response.usage
+    return {
+        "type": "usage",
+        "model": response.model,
+        "stage": stage,
+        "duration_ms": duration_ms,
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_read_input_tokens": usage.cache_read_input_tokens or 0,
+        "cache_creation_input_tokens": usage.cache_creation_input_tokens or 0,
+    }
+
+
+def _thinking_event(title: str, content: str, status: str) -> dict:
+    """Build a thinking SSE event payload."""
+    return {
+        "type": "thinking",
+        "step": ThinkingStep(title=title, content=content, status=status).model_dump(),
+    }
+
 
 class ResearchAgent:
     """AI Research Agent using Claude with Tavily web search."""
 
-    def __init__(self):
-        self.client = AsyncAnthropic(api_key=settings.anthropic_api_key)
-        self.model = "claude-sonnet-4-20250514"
+    def __init__(
+        self,
+        client: Optional[AsyncAnthropic] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.client = client or get_anthropic_client()
+        self.http_client = http_client or get_http_client()
+        self.model = settings.agent_model
+        self.planning_model = settings.planning_model
         self.tavily_api_key = settings.tavily_api_key
 
         self.tools = [
@@ -45,92 +109,422 @@ When answering questions:
 Always aim to be helpful, accurate, and honest about the source of your information."""
 
     async def search_web(self, query: str) -> list[Source]:
-        """Execute a web search using Tavily API."""
-        async with httpx.AsyncClient() as client:
+        """Execute a web search using Tavily API, served from cache when possible.
+
+        Raises if the search fails after its retries.
+        """
+        cache_key = make_cache_key(query, SEARCH_PARAMS)
+        if settings.search_cache_enabled:
+            cached = await search_cache.get(cache_key)
+            if cached is not None:
+                return [Source(**s) for s in cached]
+
+        # Identical concurrent searches share one Tavily call
+        return await search_flight.do(
+            cache_key, lambda: self._search_and_cache(query, cache_key)
+        )
+
+    async def _search_and_cache(self, query: str, cache_key: str) -> list[Source]:
+        """Call Tavily and store the results in the search cache."""
+        sources = await call_with_retry("tavily", lambda: self._tavily_search(query))
+        if settings.search_cache_enabled:
+            await search_cache.set(cache_key, query, [s.model_dump() for s in sources])
+        return sources
+
+    async def _tavily_search(self, query: str) -> list[Source]:
+        """Call the Tavily search API."""
+        with TAVILY_LATENCY.time():
+            response = await self.http_client.post(
+                f"{settings.tavily_base_url}/search",
+                json={
+                    "api_key": self.tavily_api_key,
+                    "query": query,
+                    "include_answer": False,
+                    "include_raw_content": False,
+                    **SEARCH_PARAMS,
+                },
+                timeout=settings.tavily_timeout_seconds,
+            )
+        response.raise_for_status()
+        data = response.json()
+
+        sources = []
+        for result in data.get("results", []):
+            url = result.get("url", "")
+            domain = url.split("/")[2] if url.startswith("http") else url
+            sources.append(
+                Source(
+                    url=url,
+                    title=result.get("title", ""),
+                    domain=domain,
+                    snippet=result.get("content", "")[:300],
+                )
+            )
+        return sources
+
+    async def _run_tool(self, tool_use) -> tuple:
+        """Execute one tool call with a timeout.
+
+        Returns ``(tool_use, sources, error)`` where ``error`` is a message
+        for Claude when the call could not be completed.
+        """
+        if tool_use.name != "web_search":
+            return tool_use, [], f"Unknown tool: {tool_use.name}"
+
+        query = tool_use.input.get("query", "")
+        return await self._await_search(tool_use, self.search_web(query))
+
+    @staticmethod
+    async def _await_search(tool_use, search: Awaitable) -> tuple:
+        """Wait for a search within the tool timeout.
+
+        A timeout or failure becomes an error message for Claude rather than
+        an empty result, so it is not mistaken for a search that found nothing.
+        """
+        query = tool_use.input.get("query", "")
+        try:
+            sources = await asyncio.wait_for(search, timeout=settings.tool_timeout_seconds)
+        except asyncio.TimeoutError as e:
+            record_error("tavily", e)
+            print(f"Search timed out: {query}")
+            return tool_use, [], (
+                f"Search timed out after {settings.tool_timeout_seconds:g} seconds."
+            )
+        except Exception as e:
+            print(f"Search error: {e}")
+            return tool_use, [], f"Search failed: {e}"
+        return tool_use, sources, None
+
+    def _start_speculative_search(self, user_message: str) -> asyncio.Task:
+        """Search for the question itself while Claude decides what to search."""
+        speculation_stats["started"] += 1
+        return asyncio.create_task(self.search_web(user_message.strip()[:400]))
+
+    @staticmethod
+    def _match_speculative_search(user_message: str, tool_uses: list):
+        """The web_search call closest to the question, if similar enough."""
+        question = question_tokens(user_message)
+        best, best_similarity = None, settings.speculative_match_threshold
+        for tool_use in tool_uses:
+            if tool_use.name != "web_search":
+                continue
+            similarity = jaccard(question, question_tokens(tool_use.input.get("query", "")))
+            if similarity >= best_similarity:
+                best, best_similarity = tool_use, similarity
+        return best
+
+    @staticmethod
+    def _drop_speculative_search(prefetch: asyncio.Task):
+        """Record an unused speculative search and cancel it if still running."""
+        outcome = "unused" if prefetch.done() else "cancelled"
+        prefetch.cancel()
+        if prefetch.done() and not prefetch.cancelled():
+            # Retrieve a failure nobody will await
+            prefetch.exception()
+        speculation_stats[outcome] += 1
+        SPECULATIVE_SEARCHES.labels(outcome).inc()
+
+    async def _run_speculative_search(self, tool_use, prefetch: asyncio.Task) -> tuple:
+        """Answer a tool call with the speculative search's results."""
+        speculation_stats["hit"] += 1
+        SPECULATIVE_SEARCHES.labels("hit").inc()
+        return await self._await_search(tool_use, prefetch)
+
+    def _system_blocks(self, summary: Optional[str]) -> list[dict]:
+        """System prompt blocks, with the rolling conversation summary if any."""
+        blocks = [{"type": "text", "text": self.system_prompt}]
+        if summary:
+            blocks.append(
+                {
+                    "type": "text",
+                    "text": f"Summary of the earlier conversation:\n{summary}",
+                }
+            )
+        return blocks
+
+    def _cached_prefix(
+        self, conversation: list[dict], summary: Optional[str] = None
+    ) -> dict:
+        """Request arguments with prompt cache breakpoints on the stable prefix.
+
+        Breakpoints go on the last tool, the end of the system prompt and the
+        last conversation message, so each follow-up call in the tool loop reads
+        everything before its new tool results from the cache.
+        """
+        system = self._system_blocks(summary)
+        if not settings.prompt_caching_enabled:
+            return {"system": system, "tools": self.tools, "messages": conversation}
+
+        ephemeral = {"type": "ephemeral"}
+        tools = [*self.tools[:-1], {**self.tools[-1], "cache_control": ephemeral}]
+        system[-1] = {**system[-1], "cache_control": ephemeral}
+
+        # Copy the last message so the breakpoint does not stick to the history
+        last = conversation[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            blocks = [{"type": "text", "text": content}]
+        else:
+            blocks = [
+                block
+                if isinstance(block, dict)
+                else block.model_dump(exclude_none=True)
+                for block in content
+            ]
+        blocks[-1] = {**blocks[-1], "cache_control": ephemeral}
+        messages = [*conversation[:-1], {"role": last["role"], "content": blocks}]
+
+        return {"system": system, "tools": tools, "messages": messages}
+
+    async def _stream_turn(
+        self, conversation: list[dict], turn: dict, summary: Optional[str] = None
+    ) -> AsyncGenerator[dict, None]:
+        """Stream one Claude turn, yielding text deltas as they arrive.
+
+        The assembled message is stored in ``turn["message"]`` and the call
+        duration in ``turn["duration_ms"]`` once the stream finishes. Transient
+        failures are retried as long as no text has been streamed yet.
+        """
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            emitted = False
+            await pacers["anthropic"].acquire()
+            attempt_started = time.perf_counter()
             try:
-                response = await client.post(
-                    "https://api.tavily.com/search",
-                    json={
-                        "api_key": self.tavily_api_key,
-                        "query": query,
-                        "search_depth": "advanced",
-                        "include_answer": False,
-                        "include_raw_content": False,
-                        "max_results": 5,
-                    },
-                    timeout=30.0,
+                async with self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=4096,
+                    **self._cached_prefix(conversation, summary),
+                ) as stream:
+                    async for text in stream.text_stream:
+                        emitted = True
+                        yield {"type": "content", "delta": text}
+                    turn["message"] = await stream.get_final_message()
+                ANTHROPIC_LATENCY.labels(self.model, "stream").observe(
+                    time.perf_counter() - attempt_started
                 )
-                response.raise_for_status()
-                data = response.json()
-
-                sources = []
-                for result in data.get("results", []):
-                    url = result.get("url", "")
-                    domain = url.split("/")[2] if url.startswith("http") else url
-                    sources.append(
-                        Source(
-                            url=url,
-                            title=result.get("title", ""),
-                            domain=domain,
-                            snippet=result.get("content", "")[:300],
-                        )
-                    )
-                return sources
+                record_usage(turn["message"])
+                break
             except Exception as e:
-                print(f"Search error: {e}")
-                return []
+                record_error("anthropic", e)
+                # Text already sent to the client cannot be taken back
+                delay = None if emitted else retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                print(f"anthropic call failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        turn["duration_ms"] = round((time.perf_counter() - started) * 1000)
+
+    async def _plan_turn(
+        self, conversation: list[dict], summary: Optional[str] = None
+    ) -> tuple:
+        """Let the planning model pick the first searches, without streaming.
+
+        Returns the message and the call duration in milliseconds.
+        """
+        prefix = self._cached_prefix(conversation, summary)
+        prefix["system"] = [*prefix["system"], {"type": "text", "text": PLANNING_PROMPT}]
+        started = time.perf_counter()
+        response = await call_with_retry(
+            "anthropic",
+            lambda: self.client.messages.create(
+                model=self.planning_model,
+                max_tokens=settings.planning_max_tokens,
+                **prefix,
+            ),
+        )
+        duration = time.perf_counter() - started
+        ANTHROPIC_LATENCY.labels(self.planning_model, "plan").observe(duration)
+        record_usage(response)
+        return response, round(duration * 1000)
+
+    async def generate_title(self, user_message: str) -> str:
+        """Short chat title from the title model, or the truncated message."""
+        fallback = user_message[:50] + ("..." if len(user_message) > 50 else "")
+        if not settings.generate_titles:
+            return fallback
+
+        started = time.perf_counter()
+        try:
+            response = await call_with_retry(
+                "anthropic",
+                lambda: self.client.messages.create(
+                    model=settings.title_model,
+                    max_tokens=30,
+                    system=TITLE_PROMPT,
+                    messages=[{"role": "user", "content": user_message[:2000]}],
+                ),
+            )
+        except Exception as e:
+            print(f"Title error: {e}")
+            return fallback
+        ANTHROPIC_LATENCY.labels(settings.title_model, "title").observe(
+            time.perf_counter() - started
+        )
+        record_usage(response)
+
+        title = "".join(
+            block.text for block in response.content if block.type == "text"
+        )
+        title = title.strip().strip('"').strip()
+        return title[:255] or fallback
+
+    async def _replay_cached_answer(
+        self, cached: CachedAnswer
+    ) -> AsyncGenerator[dict, None]:
+        """Stream a cached answer with the same events as a live one."""
+        yield _thinking_event(
+            "Reusing recent answer",
+            f'Found a recent answer to "{cached.question}"',
+            "complete",
+        )
+        yield {"type": "content", "delta": cached.content}
+        if cached.sources:
+            yield {"type": "sources", "sources": cached.sources}
+        yield {
+            "type": "complete",
+            "content": cached.content,
+            "thinking_steps": [],
+            "sources": cached.sources,
+        }
 
     async def generate_response(
-        self, messages: list[dict], user_message: str
+        self,
+        messages: list[dict],
+        user_message: str,
+        summary: Optional[str] = None,
     ) -> AsyncGenerator[dict, None]:
-        """Generate a streaming response with tool use."""
+        """Generate a streaming response with tool use.
+
+        ``summary`` is the rolling summary of turns older than ``messages``.
+        """
         # Build conversation history
         conversation = []
         for msg in messages:
             conversation.append({"role": msg["role"], "content": msg["content"]})
         conversation.append({"role": "user", "content": user_message})
 
+        # Recent answers to near-duplicate questions only apply to a first turn
+        use_answer_cache = (
+            settings.answer_cache_enabled and not messages and not summary
+        )
+        if use_answer_cache:
+            cached = answer_cache.lookup(user_message)
+            if cached:
+                async for event in self._replay_cached_answer(cached):
+                    yield event
+                return
+
         thinking_steps: list[ThinkingStep] = []
-        all_sources: list[Source] = []
+        collector = SourceCollector(
+            user_message, settings.source_top_k, settings.source_token_budget
+        )
+        all_sources: list[Source] = collector.sources
         final_content = ""
+        tool_calls = 0
 
         # Initial thinking step
-        yield {
-            "type": "thinking",
-            "step": ThinkingStep(
-                title="Analyzing question",
-                content="Understanding what information is needed...",
-                status="in_progress",
-            ).model_dump(),
-        }
+        yield _thinking_event(
+            "Analyzing question",
+            "Understanding what information is needed...",
+            "in_progress",
+        )
+
+        analyzing = True
+        composing = False
+        # With routing on, the first turn only plans searches on the small model
+        planning = settings.model_routing_enabled
+        # Overlap a search for the question with the first turn
+        prefetch = (
+            self._start_speculative_search(user_message)
+            if settings.speculative_search_enabled
+            else None
+        )
 
         try:
-            # First API call - may include tool use
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=self.system_prompt,
-                tools=self.tools,
-                messages=conversation,
-            )
+            while True:
+                turn: dict = {}
+                turn_has_text = False
+                if planning:
+                    try:
+                        turn["message"], turn["duration_ms"] = await self._plan_turn(
+                            conversation, summary
+                        )
+                    except Exception as e:
+                        print(f"Planning error, answering directly: {e}")
+                        planning = False
+                        continue
+                else:
+                    # Stream the next turn, forwarding text as soon as it arrives
+                    async for event in self._stream_turn(
+                        conversation, turn, summary
+                    ):
+                        if analyzing:
+                            analyzing = False
+                            yield _thinking_event(
+                                "Analyzing question",
+                                "Understanding what information is needed...",
+                                "complete",
+                            )
+                        if not composing:
+                            composing = True
+                            yield _thinking_event(
+                                "Composing answer",
+                                "Synthesizing information...",
+                                "in_progress",
+                            )
+                        # Keep text from separate turns in separate paragraphs
+                        if final_content and not turn_has_text:
+                            final_content += "\n\n"
+                            yield {"type": "content", "delta": "\n\n"}
+                        turn_has_text = True
+                        final_content += event["delta"]
+                        yield event
+
+                response = turn["message"]
+                yield _usage_event(
+                    response, turn["duration_ms"], "planning" if planning else "answer"
+                )
 
-            # Update thinking step
-            yield {
-                "type": "thinking",
-                "step": ThinkingStep(
-                    title="Analyzing question",
-                    content="Understanding what information is needed...",
-                    status="complete",
-                ).model_dump(),
-            }
+                if analyzing:
+                    analyzing = False
+                    yield _thinking_event(
+                        "Analyzing question",
+                        "Understanding what information is needed...",
+                        "complete",
+                    )
+
+                if response.stop_reason != "tool_use":
+                    if planning:
+                        # No search needed; the large model writes the answer
+                        PLANNING_DECISIONS.labels("answer").inc()
+                        planning = False
+                        continue
+                    break
+                if planning:
+                    PLANNING_DECISIONS.labels("search").inc()
+                    planning = False
 
-            # Process response - handle tool use
-            while response.stop_reason == "tool_use":
                 # Find tool use blocks
                 tool_uses = [
                     block for block in response.content if block.type == "tool_use"
                 ]
-
+                tool_calls += len(tool_uses)
+                for tool_use in tool_uses:
+                    TOOL_CALLS.labels(tool_use.name).inc()
+
+                # The speculative search can stand in for one call of the first round
+                speculated = None
+                if prefetch:
+                    speculated = self._match_speculative_search(user_message, tool_uses)
+                    if speculated is None:
+                        self._drop_speculative_search(prefetch)
+                        prefetch = None
+
+                # Run every tool call in this turn concurrently
+                tasks = []
                 for tool_use in tool_uses:
                     if tool_use.name == "web_search":
                         query = tool_use.input.get("query", "")
@@ -139,18 +533,43 @@ Always aim to be helpful, accurate, and honest about the source of your informat
                         yield {"type": "tool_call", "tool": "web_search", "query": query}
 
                         # Emit thinking step for search
-                        yield {
-                            "type": "thinking",
-                            "step": ThinkingStep(
-                                title="Searching the web",
-                                content=f'Looking up: "{query}"',
-                                status="in_progress",
-                            ).model_dump(),
-                        }
+                        yield _thinking_event(
+                            "Searching the web",
+                            f'Looking up: "{query}"',
+                            "in_progress",
+                        )
+                    if tool_use is speculated:
+                        run = self._run_speculative_search(tool_use, prefetch)
+                        prefetch = None
+                    else:
+                        run = self._run_tool(tool_use)
+                    tasks.append(asyncio.create_task(run))
+
+                tool_results = {}
+                try:
+                    # Report each search as soon as it finishes
+                    for next_done in asyncio.as_completed(tasks):
+                        tool_use, sources, error = await next_done
+
+                        if error:
+                            if tool_use.name == "web_search":
+                                yield _thinking_event(
+                                    "Searching the web",
+                                    f'Could not search for "{tool_use.input.get("query", "")}"',
+                                    "complete",
+                                )
+                            tool_results[tool_use.id] = {
+                                "type": "tool_result",
+                                "tool_use_id": tool_use.id,
+                                "content": error,
+                                "is_error": True,
+                            }
+                            continue
 
-                        # Execute search
-                        sources = await self.search_web(query)
-                        all_sources.extend(sources)
+                        query = tool_use.input.get("query", "")
+                        # Drop pages already seen, keep the most relevant ones
+                        found = len(sources)
+                        sources = collector.add(sources)
 
                         # Emit tool result
                         yield {
@@ -159,89 +578,67 @@ Always aim to be helpful, accurate, and honest about the source of your informat
                         }
 
                         # Update thinking step
-                        yield {
-                            "type": "thinking",
-                            "step": ThinkingStep(
-                                title="Searching the web",
-                                content=f'Found {len(sources)} results for "{query}"',
-                                status="complete",
-                            ).model_dump(),
-                        }
-
-                        # Build tool result for Claude
-                        tool_result_content = json.dumps(
-                            [
-                                {
-                                    "title": s.title,
-                                    "url": s.url,
-                                    "content": s.snippet,
-                                }
-                                for s in sources
-                            ]
+                        yield _thinking_event(
+                            "Searching the web",
+                            f'Found {len(sources)} results for "{query}"',
+                            "complete",
                         )
 
-                        # Continue conversation with tool result
-                        conversation.append(
-                            {"role": "assistant", "content": response.content}
-                        )
-                        conversation.append(
-                            {
-                                "role": "user",
-                                "content": [
+                        # Build tool result for Claude
+                        if sources:
+                            content = json.dumps(
+                                [
                                     {
-                                        "type": "tool_result",
-                                        "tool_use_id": tool_use.id,
-                                        "content": tool_result_content,
+                                        "title": s.title,
+                                        "url": s.url,
+                                        "content": s.snippet,
                                     }
-                                ],
-                            }
-                        )
-
-                # Continue with next response
-                response = await self.client.messages.create(
-                    model=self.model,
-                    max_tokens=4096,
-                    system=self.system_prompt,
-                    tools=self.tools,
-                    messages=conversation,
+                                    for s in sources
+                                ]
+                            )
+                        elif found:
+                            content = (
+                                "No new results: every page found was already "
+                                "returned by an earlier search."
+                            )
+                        else:
+                            content = "No results found."
+                        tool_results[tool_use.id] = {
+                            "type": "tool_result",
+                            "tool_use_id": tool_use.id,
+                            "content": content,
+                        }
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+                # Continue conversation with one assistant turn and all its results
+                conversation.append({"role": "assistant", "content": response.content})
+                conversation.append(
+                    {
+                        "role": "user",
+                        "content": [tool_results[t.id] for t in tool_uses],
+                    }
                 )
 
-            # Emit thinking step for composing answer
-            yield {
-                "type": "thinking",
-                "step": ThinkingStep(
-                    title="Composing answer",
-                    content="Synthesizing information...",
-                    status="in_progress",
-                ).model_dump(),
-            }
-
-            # Extract final text content
-            for block in response.content:
-                if hasattr(block, "text"):
-                    final_content = block.text
-                    break
+            TOOL_CALLS_PER_ANSWER.observe(tool_calls)
 
             # Update thinking step
-            yield {
-                "type": "thinking",
-                "step": ThinkingStep(
-                    title="Composing answer",
-                    content="Synthesizing information...",
-                    status="complete",
-                ).model_dump(),
-            }
-
-            # Stream content in chunks for typing effect
-            chunk_size = 20
-            for i in range(0, len(final_content), chunk_size):
-                chunk = final_content[i : i + chunk_size]
-                yield {"type": "content", "delta": chunk}
+            yield _thinking_event(
+                "Composing answer",
+                "Synthesizing information...",
+                "complete",
+            )
 
             # Emit sources if any
             if all_sources:
                 yield {"type": "sources", "sources": [s.model_dump() for s in all_sources]}
 
+            if use_answer_cache:
+                answer_cache.store(
+                    user_message, final_content, [s.model_dump() for s in all_sources]
+                )
+
             # Emit complete event
             yield {
                 "type": "complete",
@@ -252,3 +649,7 @@ Always aim to be helpful, accurate, and honest about the source of your informat
 
         except Exception as e:
             yield {"type": "error", "message": str(e)}
+
+        finally:
+            if prefetch:
+                self._drop_speculative_search(prefetch)
@@ -0,0 +1,77 @@
+import math
+import re
+from collections import Counter
+from app.agents.context_builder import estimate_tokens
+from app.models.schemas import Source
+from app.services.urls import canonical_url, clean_url
+
+
+def _terms(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def bm25_rank(
+    question: str, sources: list[Source], k1: float = 1.5, b: float = 0.75
+) -> list[Source]:
+    """Order sources by BM25 relevance of their title and snippet to the question."""
+    if len(sources) < 2:
+        return list(sources)
+    docs = [_terms(f"{s.title} {s.snippet or ''}") for s in sources]
+    avg_len = sum(len(d) for d in docs) / len(docs) or 1.0
+    doc_freq = Counter(term for d in docs for term in set(d))
+    n = len(docs)
+    query_terms = set(_terms(question))
+
+    def score(doc: list[str]) -> float:
+        counts = Counter(doc)
+        total = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            total += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_len))
+        return total
+
+    scores = [score(d) for d in docs]
+    order = sorted(range(n), key=lambda i: scores[i], reverse=True)
+    return [sources[i] for i in order]
+
+
+class SourceCollector:
+    """Deduplicates sources across the tool calls of one answer.
+
+    Each batch of search results is cleaned, stripped of pages already
+    selected (by canonical URL), reranked against the user question with BM25, and
+    cut to the top ``top_k`` that fit in ``token_budget``.
+    """
+
+    def __init__(self, question: str, top_k: int, token_budget: int):
+        self.question = question
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.seen: set[str] = set()
+        self.sources: list[Source] = []
+
+    def add(self, results: list[Source]) -> list[Source]:
+        """Process one tool call's results and return the ones to use."""
+        fresh = {}
+        for source in results:
+            key = canonical_url(source.url)
+            if key in self.seen or key in fresh:
+                continue
+            fresh[key] = source.model_copy(update={"url": clean_url(source.url)})
+
+        selected = []
+        used = 0
+        for source in bm25_rank(self.question, list(fresh.values()))[: self.top_k]:
+            text = f"{source.title} {source.url} {source.snippet or ''}"
+            cost = estimate_tokens(text)
+            if selected and used + cost > self.token_budget:
+                break
+            selected.append(source)
+            used += cost
+        # Pages cut here can still be used if a later search finds them again
+        self.seen.update(canonical_url(source.url) for source in selected)
+        self.sources.extend(selected)
+        return selected
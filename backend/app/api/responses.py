@@ -0,0 +1,52 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, bypassing response_model validation.
+
+    Datetimes are encoded natively, and UTC datetimes use a ``Z`` suffix as the
+    Pydantic serialization of the response models does. Other types, such as
+    asyncpg's UUID subclass, fall back to ``str``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_UTC_Z)
+
+
+def ndjson_line(content: Any) -> bytes:
+    """Encode one NDJSON line the same way as FastJSONResponse."""
+    return orjson.dumps(
+        content, default=str, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE
+    )
+
+
+def chat_row_to_dict(row) -> dict:
+    """Shape a chat row like ChatListResponse."""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
+
+
+def message_row_to_dict(row) -> dict:
+    """Shape a message row like MessageResponse, filling JSONB defaults."""
+    return {
+        "id": row.id,
+        "chat_id": row.chat_id,
+        "role": row.role,
+        "content": row.content,
+        "thinking_steps": [
+            step if "status" in step else {**step, "status": "complete"}
+            for step in row.thinking_steps or []
+        ],
+        "sources": [
+            source if "snippet" in source else {**source, "snippet": None}
+            for source in row.sources or []
+        ],
+        "status": row.status,
+        "created_at": row.created_at,
+    }
@@ -1,22 +1,50 @@
-import json
-from uuid import UUID
-from typing import AsyncGenerator
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+from typing import AsyncGenerator, Optional
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app.services.chat_service import ChatService
-from app.agents.research_agent import ResearchAgent
+from app.config import get_settings
+from app.database import get_db, async_session_maker
+from app.api.responses import (
+    FastJSONResponse,
+    chat_row_to_dict,
+    message_row_to_dict,
+    ndjson_line,
+)
+from app.services.chat_service import ChatService, InvalidCursorError
+from app.services.answer_cache import answer_cache
+from app.services.metrics import ACTIVE_STREAMS, SSE_FIRST_BYTE, SSE_FIRST_CONTENT
+from app.services.admission import AdmissionRejected, AdmissionTicket, admission
+from app.services.retry import set_latency_budget
+from app.services.run_manager import run_manager
+from app.services.search_cache import search_cache
+from app.services.sse import format_sse
+from app.agents.context_builder import ContextBuilder, schedule_fold
+from app.agents.research_agent import ResearchAgent, search_flight, speculation_stats
 from app.models.schemas import (
     ChatCreate,
     ChatResponse,
     ChatListResponse,
     MessageCreate,
-    MessageResponse,
+    SearchHit,
+    SearchResponse,
 )
 
+settings = get_settings()
+
 router = APIRouter(prefix="/api")
 
+# Upper bound for the limit query parameter on paginated endpoints
+MAX_PAGE_SIZE = 200
+
+# Export lines are sent in chunks of about this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+
 
 @router.post("/chats", response_model=ChatResponse)
 async def create_chat(
@@ -37,48 +65,51 @@ async def create_chat(
 
 
 @router.get("/chats", response_model=list[ChatListResponse])
-async def list_chats(db: AsyncSession = Depends(get_db)):
-    """List all chats."""
+async def list_chats(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """List chats, newest first."""
     service = ChatService(db)
-    chats = await service.list_chats()
-    return [
-        ChatListResponse(
-            id=chat.id,
-            title=chat.title,
-            created_at=chat.created_at,
-            updated_at=chat.updated_at,
-        )
-        for chat in chats
-    ]
+    try:
+        chats, next_cursor = await service.list_chats(limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(
+        [chat_row_to_dict(chat) for chat in chats], headers=headers
+    )
 
 
 @router.get("/chats/{chat_id}", response_model=ChatResponse)
-async def get_chat(chat_id: UUID, db: AsyncSession = Depends(get_db)):
-    """Get a chat with all messages."""
+async def get_chat(
+    chat_id: UUID,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a chat with its messages."""
     service = ChatService(db)
     chat = await service.get_chat(chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    messages = [
-        MessageResponse(
-            id=msg.id,
-            chat_id=msg.chat_id,
-            role=msg.role,
-            content=msg.content,
-            thinking_steps=msg.thinking_steps or [],
-            sources=msg.sources or [],
-            created_at=msg.created_at,
+    try:
+        messages, next_cursor = await service.get_messages_page(
+            chat_id, limit=limit, cursor=cursor
         )
-        for msg in chat.messages
-    ]
-
-    return ChatResponse(
-        id=chat.id,
-        title=chat.title,
-        created_at=chat.created_at,
-        updated_at=chat.updated_at,
-        messages=messages,
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+
+    # Serialize rows directly instead of validating through response models
+    return FastJSONResponse(
+        {
+            **chat_row_to_dict(chat),
+            "messages": [message_row_to_dict(msg) for msg in messages],
+        },
+        headers=headers,
     )
 
 
@@ -93,12 +124,113 @@ async def delete_chat(chat_id: UUID, db: AsyncSession = Depends(get_db)):
 
 
 @router.delete("/chats")
-async def delete_all_chats(db: AsyncSession = Depends(get_db)):
-    """Delete all chats."""
+async def delete_all_chats(
+    older_than_days: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete all chats, or only those not updated in ``older_than_days`` days."""
     service = ChatService(db)
-    count = await service.delete_all_chats()
-    await db.commit()
-    return {"status": "deleted", "count": count}
+    older_than = None
+    if older_than_days is not None:
+        older_than = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    count = 0
+    while True:
+        deleted = await service.delete_chats_batch(older_than=older_than)
+        await db.commit()
+        count += deleted
+        if deleted < settings.delete_batch_size:
+            return {"status": "deleted", "count": count}
+
+
+async def export_lines(since: Optional[datetime]) -> AsyncGenerator[bytes, None]:
+    """NDJSON for every chat followed by its messages, in chunks."""
+    async with async_session_maker() as db:
+        chat_id = None
+        chunk = []
+        size = 0
+        async for row in ChatService(db).export_rows(since=since):
+            if row.chat_id != chat_id:
+                chat_id = row.chat_id
+                line = ndjson_line({
+                    "type": "chat",
+                    "id": row.chat_id,
+                    "title": row.title,
+                    "created_at": row.chat_created_at,
+                    "updated_at": row.updated_at,
+                })
+                chunk.append(line)
+                size += len(line)
+            if row.id is not None:
+                line = ndjson_line({"type": "message", **message_row_to_dict(row)})
+                chunk.append(line)
+                size += len(line)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b"".join(chunk)
+
+
+@router.get("/export")
+async def export_chats(since: Optional[datetime] = Query(None)):
+    """Stream all chats and messages as NDJSON."""
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return StreamingResponse(
+        export_lines(since),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="pantheon-export.ndjson"'},
+    )
+
+
+async def ndjson_records(request: Request, line: dict) -> AsyncGenerator[dict, None]:
+    """Parse a streamed NDJSON request body one record at a time."""
+
+    def parse(raw: bytes) -> Optional[dict]:
+        line["number"] += 1
+        if not raw.strip():
+            return None
+        try:
+            record = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line['number']}")
+        if not isinstance(record, dict) or record.get("type") not in ("chat", "message"):
+            raise HTTPException(
+                status_code=400, detail=f"Unknown record type on line {line['number']}"
+            )
+        return record
+
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            record = parse(raw)
+            if record:
+                yield record
+    if buffer:
+        record = parse(buffer)
+        if record:
+            yield record
+
+
+@router.post("/import")
+async def import_chats(request: Request, db: AsyncSession = Depends(get_db)):
+    """Bulk import chats and messages from NDJSON in the export format."""
+    line = {"number": 0}
+    try:
+        counts = await ChatService(db).import_records(ndjson_records(request, line))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid record on line {line['number']}: {e}"
+        )
+    except IntegrityError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch ending on line {line['number']} was rejected: {e.orig}",
+        )
+    return {"status": "imported", **counts}
 
 
 @router.patch("/chats/{chat_id}/title")
@@ -115,98 +247,292 @@ async def update_chat_title(
     return {"status": "updated", "title": chat.title}
 
 
+@router.get("/search", response_model=SearchResponse)
+async def search_chats(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Search past conversations, returning ranked hits with highlighted snippets."""
+    service = ChatService(db)
+    rows, has_more = await service.search(q, limit=limit, offset=offset)
+    return SearchResponse(
+        results=[SearchHit.model_validate(row, from_attributes=True) for row in rows],
+        next_offset=offset + limit if has_more else None,
+    )
+
+
+@router.get("/search-cache/stats")
+async def search_cache_stats():
+    """Hit and miss counters for the web search cache."""
+    return {
+        **search_cache.stats(),
+        "tavily_calls": search_flight.calls,
+        "coalesced": search_flight.coalesced,
+        "in_flight": search_flight.in_flight(),
+    }
+
+
+@router.get("/answer-cache/stats")
+async def answer_cache_stats():
+    """Hit rate and similarity figures for the near-duplicate answer cache."""
+    return answer_cache.stats()
+
+
+@router.get("/speculative-search/stats")
+async def speculative_search_stats():
+    """How often the speculative search was used, and how often it was wasted."""
+    started = speculation_stats["started"]
+    return {
+        "enabled": settings.speculative_search_enabled,
+        **speculation_stats,
+        "hit_rate": speculation_stats["hit"] / started if started else 0.0,
+    }
+
+
+@router.get("/admission/stats")
+async def admission_stats():
+    """Concurrent run slots, queue depth and queue wait times."""
+    return admission.stats()
+
+
 async def generate_sse_events(
     chat_id: UUID,
     user_message: str,
-    db: AsyncSession,
+    message_id: UUID,
 ) -> AsyncGenerator[str, None]:
     """Generate SSE events for a chat message."""
-    service = ChatService(db)
     agent = ResearchAgent()
+    started = time.perf_counter()
+    set_latency_budget(settings.request_latency_budget_seconds)
 
-    # Get existing messages for context
-    messages = await service.get_chat_messages(chat_id)
-    message_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in messages
-    ]
+    # Get recent messages and the rolling summary of older ones for context
+    summary, message_history = await ContextBuilder().build(chat_id)
+    is_first_exchange = not message_history and not summary
 
     # Save user message
-    await service.add_message(chat_id, "user", user_message)
-    await db.commit()
+    async with async_session_maker() as db:
+        await ChatService(db).save_message(chat_id, "user", user_message)
+        await db.commit()
+
+    # Title the chat on the small model while the answer is being written
+    title_task = (
+        asyncio.create_task(agent.generate_title(user_message))
+        if is_first_exchange
+        else None
+    )
 
     # Track response data
     final_content = ""
     all_thinking_steps = []
     all_sources = []
+    partial_sources = []
+    first_content = True
+    saved = False
 
     try:
-        async for event in agent.generate_response(message_history, user_message):
+        async for event in agent.generate_response(
+            message_history, user_message, summary
+        ):
             event_type = event.get("type")
 
             if event_type == "thinking":
                 all_thinking_steps.append(event["step"])
-                yield f"event: thinking\ndata: {json.dumps(event)}\n\n"
+                yield format_sse("thinking", event)
 
             elif event_type == "tool_call":
-                yield f"event: tool_call\ndata: {json.dumps(event)}\n\n"
+                yield format_sse("tool_call", event)
 
             elif event_type == "tool_result":
-                yield f"event: tool_result\ndata: {json.dumps(event)}\n\n"
+                partial_sources.extend(event["results"])
+                yield format_sse("tool_result", event)
 
             elif event_type == "content":
-                yield f"event: content\ndata: {json.dumps(event)}\n\n"
+                if first_content:
+                    first_content = False
+                    SSE_FIRST_CONTENT.observe(time.perf_counter() - started)
+                final_content += event["delta"]
+                yield format_sse("content", event)
+
+            elif event_type == "usage":
+                yield format_sse("usage", event)
 
             elif event_type == "sources":
                 all_sources = event["sources"]
-                yield f"event: sources\ndata: {json.dumps(event)}\n\n"
+                yield format_sse("sources", event)
 
             elif event_type == "complete":
                 final_content = event["content"]
-                # Save assistant message
-                assistant_msg = await service.add_message(
+                # Title generated for the first exchange
+                title = await title_task if title_task else None
+
+                # Save assistant message, title and updated_at in one round trip
+                async with async_session_maker() as db:
+                    await ChatService(db).save_message(
+                        chat_id,
+                        "assistant",
+                        final_content,
+                        thinking_steps=all_thinking_steps,
+                        sources=all_sources,
+                        title=title,
+                        message_id=message_id,
+                    )
+                    await db.commit()
+                saved = True
+                # Summarize older history off the critical path of the next turn
+                schedule_fold(chat_id)
+
+                yield format_sse("complete", {"message_id": str(message_id)})
+
+            elif event_type == "error":
+                yield format_sse("error", event)
+
+    except asyncio.CancelledError:
+        if not saved:
+            # Keep the chat consistent: every user turn gets a reply row
+            async with async_session_maker() as db:
+                await ChatService(db).save_message(
                     chat_id,
                     "assistant",
                     final_content,
                     thinking_steps=all_thinking_steps,
-                    sources=all_sources,
+                    sources=partial_sources,
+                    message_id=message_id,
+                    status="aborted",
                 )
                 await db.commit()
-
-                # Auto-generate title if this is the first exchange
-                if len(messages) == 0:
-                    # Use first 50 chars of user message as title
-                    title = user_message[:50] + ("..." if len(user_message) > 50 else "")
-                    await service.update_chat_title(chat_id, title)
-                    await db.commit()
-
-                yield f"event: complete\ndata: {json.dumps({'message_id': str(assistant_msg.id)})}\n\n"
-
-            elif event_type == "error":
-                yield f"event: error\ndata: {json.dumps(event)}\n\n"
+        raise
 
     except Exception as e:
-        yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        yield format_sse("error", {"message": str(e)})
+
+    finally:
+        if title_task:
+            title_task.cancel()
+
+
+async def replay_stored_message(message) -> AsyncGenerator[str, None]:
+    """Replay a finished run as a snapshot of its stored message."""
+    yield format_sse(
+        "snapshot",
+        {
+            "type": "snapshot",
+            "message_id": str(message.id),
+            "content": message.content,
+            "thinking_steps": message.thinking_steps or [],
+            "sources": message.sources or [],
+            "status": message.status,
+        },
+    )
+    event = "aborted" if message.status == "aborted" else "complete"
+    yield format_sse(event, {"message_id": str(message.id)})
 
 
-@router.post("/chats/{chat_id}/messages")
-async def send_message(
-    chat_id: UUID,
-    message: MessageCreate,
-    db: AsyncSession = Depends(get_db),
-):
-    """Send a message and stream the response via SSE."""
-    service = ChatService(db)
-    chat = await service.get_chat(chat_id)
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+async def admitted_events(
+    ticket: AdmissionTicket, events: AsyncGenerator[str, None]
+) -> AsyncGenerator[str, None]:
+    """Hold ``events`` back until the ticket is admitted, reporting the queue position."""
+    try:
+        position = None
+        while not ticket.admitted:
+            if ticket.position() != position:
+                position = ticket.position()
+                yield format_sse("queued", {"type": "queued", "position": position})
+            await ticket.wait_for_update()
+        async for chunk in events:
+            yield chunk
+    finally:
+        ticket.release()
+
+
+async def timed_first_event(
+    events: AsyncGenerator[str, None], started: float
+) -> AsyncGenerator[str, None]:
+    """Time the first of the agent's own events from ``started``."""
+    first = True
+    async for chunk in events:
+        if first:
+            first = False
+            SSE_FIRST_BYTE.observe(time.perf_counter() - started)
+        yield chunk
+
+
+async def instrumented(events: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """Count the open stream."""
+    ACTIVE_STREAMS.inc()
+    try:
+        async for chunk in events:
+            yield chunk
+    finally:
+        ACTIVE_STREAMS.dec()
+        # Release the subscription now rather than when garbage collected
+        await events.aclose()
 
+
+def sse_response(events: AsyncGenerator[str, None], run_id: UUID) -> StreamingResponse:
+    """Wrap SSE events in a streaming response tagged with the run ID."""
     return StreamingResponse(
-        generate_sse_events(chat_id, message.content, db),
+        instrumented(events),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            "X-Run-Id": str(run_id),
         },
     )
+
+
+@router.post("/chats/{chat_id}/messages")
+async def send_message(chat_id: UUID, message: MessageCreate):
+    """Send a message and stream the response via SSE."""
+    started = time.perf_counter()
+    # Short-lived session so the connection is not held for the whole stream
+    async with async_session_maker() as db:
+        chat = await ChatService(db).get_chat(chat_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    try:
+        ticket = admission.admit()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent requests",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    run_id = uuid4()
+    run = run_manager.start(
+        run_id,
+        chat_id,
+        admitted_events(
+            ticket,
+            # Time to first byte covers the queue wait, but not the run
+            # and queued bookkeeping events
+            timed_first_event(
+                generate_sse_events(chat_id, message.content, run_id), started
+            ),
+        ),
+    )
+    run.publish(format_sse("run", {"run_id": str(run_id)}))
+    return sse_response(run.subscribe(), run_id)
+
+
+@router.get("/runs/{run_id}/events")
+async def resume_run(
+    run_id: UUID,
+    last_event_id: Optional[int] = Header(None, ge=0),
+):
+    """Resume a run's SSE stream after ``Last-Event-ID``."""
+    last_event_id = last_event_id or 0
+    run = run_manager.get(run_id)
+    if run and (not run.done or run.can_replay_from(last_event_id)):
+        return sse_response(run.subscribe(last_event_id), run_id)
+
+    async with async_session_maker() as db:
+        message = await ChatService(db).get_message(run_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return sse_response(replay_stored_message(message), run_id)
@@ -0,0 +1,65 @@
+from typing import Optional
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+from app.config import get_settings
+
+settings = get_settings()
+
+# Process-wide clients, created in the app lifespan and shared by every request
+_http_client: Optional[httpx.AsyncClient] = None
+_anthropic_client: Optional[AsyncAnthropic] = None
+
+
+def _pool_limits() -> httpx.Limits:
+    """Connection pool limits from settings."""
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client used for outbound API calls."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=_pool_limits(),
+            http2=settings.http2_enabled,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+    return _http_client
+
+
+def get_anthropic_client() -> AsyncAnthropic:
+    """Get the shared Anthropic client."""
+    global _anthropic_client
+    if _anthropic_client is None:
+        # Retries are handled by app.services.retry, not by the SDK
+        _anthropic_client = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            base_url=settings.anthropic_base_url,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(
+                limits=_pool_limits(),
+                http2=settings.http2_enabled,
+            ),
+        )
+    return _anthropic_client
+
+
+async def init_clients():
+    """Create the shared clients so the first request does not pay for it."""
+    get_http_client()
+    get_anthropic_client()
+
+
+async def close_clients():
+    """Close the shared clients and their connection pools."""
+    global _http_client, _anthropic_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _anthropic_client is not None:
+        await _anthropic_client.close()
+        _anthropic_client = None
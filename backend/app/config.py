@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -9,6 +10,98 @@ class Settings(BaseSettings):
     tavily_api_key: str = ""
     frontend_url: str = "http://localhost:5173"
 
+    # Provider endpoints; overridden to point at local stand-ins when benchmarking
+    anthropic_base_url: Optional[str] = None
+    tavily_base_url: str = "https://api.tavily.com"
+
+    # Database connection pool
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+
+    # Chats deleted per statement by bulk deletes
+    delete_batch_size: int = 1000
+
+    # Rows per server-side cursor fetch on export, and records committed per
+    # batch on import
+    export_batch_size: int = 1000
+    import_batch_size: int = 1000
+
+    # Outbound HTTP connection pools (Anthropic and Tavily)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2_enabled: bool = True
+
+    # Web search result cache
+    search_cache_enabled: bool = True
+    search_cache_max_entries: int = 1024
+    search_cache_ttl_seconds: float = 3600.0
+    search_cache_persistent: bool = False
+    # How often expired rows are deleted from the persistent tier
+    search_cache_purge_interval_seconds: float = 3600.0
+
+    # Opt-in reuse of recent answers to near-duplicate first-turn questions
+    answer_cache_enabled: bool = False
+    answer_cache_threshold: float = 0.8
+    answer_cache_ttl_seconds: float = 6 * 3600
+    answer_cache_max_entries: int = 5000
+
+    # Model routing: a small model plans searches and writes titles, the
+    # large model writes the answer
+    agent_model: str = "claude-sonnet-4-20250514"
+    model_routing_enabled: bool = True
+    planning_model: str = "claude-3-5-haiku-20241022"
+    planning_max_tokens: int = 512
+    generate_titles: bool = True
+    title_model: str = "claude-3-5-haiku-20241022"
+
+    # Anthropic prompt caching of system prompt, tools and conversation prefix
+    prompt_caching_enabled: bool = True
+
+    # Conversation context sent to the agent
+    context_token_budget: int = 12000
+    context_recent_token_target: int = 6000
+    summary_model: str = "claude-3-5-haiku-20241022"
+    summary_max_tokens: int = 1024
+
+    # Admission control for concurrent agent runs
+    max_concurrent_runs: int = 20
+    max_queued_runs: int = 50
+    queue_retry_after_seconds: int = 15
+
+    # Detached agent runs and their replay buffers
+    run_event_buffer_size: int = 5000
+    run_retention_seconds: float = 300.0
+    # Cancel runs nobody has been listening to for this long
+    abort_abandoned_runs: bool = True
+    run_abandon_grace_seconds: float = 5.0
+
+    # Retries and pacing for Anthropic and Tavily calls
+    retry_max_attempts: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+    request_latency_budget_seconds: float = 120.0
+    anthropic_rate_limit: float = 10.0
+    anthropic_burst: int = 20
+    tavily_rate_limit: float = 5.0
+    tavily_burst: int = 10
+    # Per-attempt Tavily timeout; keep attempts and backoff within
+    # tool_timeout_seconds so a hung request is retried, not abandoned
+    tavily_timeout_seconds: float = 5.0
+
+    # Opt-in search for the user's question started alongside the first turn,
+    # used when Claude asks for a similar query
+    speculative_search_enabled: bool = False
+    speculative_match_threshold: float = 0.5
+
+    # Agent tool execution
+    tool_timeout_seconds: float = 20.0
+    # Of the 5 results per search, only the best few go back to Claude
+    source_top_k: int = 3
+    source_token_budget: int = 350
+
     @field_validator("database_url", mode="before")
     @classmethod
     def convert_database_url(cls, v: str) -> str:
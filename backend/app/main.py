@@ -1,10 +1,15 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
 from app.database import init_db
+from app.clients import init_clients, close_clients
 from app.api.routes import router
+from app.services.metrics import render as render_metrics
+from app.services.run_manager import run_manager
+from app.services.search_cache import search_cache
 
 settings = get_settings()
 
@@ -14,8 +19,18 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup
     await init_db()
+    await init_clients()
+    purge_task = None
+    if settings.search_cache_enabled and settings.search_cache_persistent:
+        purge_task = asyncio.create_task(
+            search_cache.purge_periodically(settings.search_cache_purge_interval_seconds)
+        )
     yield
     # Shutdown
+    if purge_task:
+        purge_task.cancel()
+    await run_manager.shutdown()
+    await close_clients()
 
 
 app = FastAPI(
@@ -47,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Run-Id"],
 )
 
 # Include API routes
@@ -57,3 +73,10 @@ app.include_router(router)
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
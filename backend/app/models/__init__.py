@@ -1,4 +1,4 @@
-from app.models.database import Chat, Message
+from app.models.database import Chat, Message, MessageSource, SearchCacheEntry, SourceRecord
 from app.models.schemas import (
     ChatCreate,
     ChatResponse,
@@ -7,11 +7,16 @@ from app.models.schemas import (
     MessageResponse,
     ThinkingStep,
     Source,
+    SearchHit,
+    SearchResponse,
 )
 
 __all__ = [
     "Chat",
     "Message",
+    "MessageSource",
+    "SearchCacheEntry",
+    "SourceRecord",
     "ChatCreate",
     "ChatResponse",
     "ChatListResponse",
@@ -19,4 +24,6 @@ __all__ = [
     "MessageResponse",
     "ThinkingStep",
     "Source",
+    "SearchHit",
+    "SearchResponse",
 ]
@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, ForeignKey, Integer, CheckConstraint, Sequence
-from sqlalchemy.dialects.postgresql import UUID, JSONB, TIMESTAMP
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, ForeignKey, Integer, BigInteger, CheckConstraint, Sequence, Computed
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TIMESTAMP, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from app.database import Base
 
 
@@ -11,10 +11,19 @@ class Chat(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(255), nullable=True)
+    summary = Column(Text, nullable=True)
+    summary_through_seq = Column(Integer, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
     updated_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Only used in SQL by full-text search, so never loaded with the row
+    title_vector = deferred(
+        Column(TSVECTOR, Computed("to_tsvector('english', coalesce(title, ''))", persisted=True))
+    )
+
+    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", passive_deletes=True, order_by="Message.sequence_num")
 
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", order_by="Message.sequence_num")
+    # Don't fetch title_vector back through RETURNING on insert
+    __mapper_args__ = {"eager_defaults": False}
 
 
 # Sequence for message ordering
@@ -30,11 +39,50 @@ class Message(Base):
     content = Column(Text, nullable=False)
     thinking_steps = Column(JSONB, default=list)
     sources = Column(JSONB, default=list)
+    status = Column(String(20), nullable=False, default="complete", server_default="complete")
     created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
     sequence_num = Column(Integer, message_sequence, server_default=message_sequence.next_value())
+    search_vector = deferred(
+        Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))
+    )
 
     chat = relationship("Chat", back_populates="messages")
 
     __table_args__ = (
         CheckConstraint("role IN ('user', 'assistant')", name="check_role"),
+        CheckConstraint("status IN ('complete', 'aborted')", name="check_status"),
     )
+
+
+class SourceRecord(Base):
+    """A web page cited by answers, stored once per canonical URL."""
+
+    __tablename__ = "sources"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    canonical_url = Column(Text, nullable=False, unique=True)
+    url = Column(Text, nullable=False)
+    title = Column(Text, nullable=False)
+    domain = Column(String(255), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+
+
+class MessageSource(Base):
+    """Ordered link from a message to a source it cites."""
+
+    __tablename__ = "message_sources"
+
+    message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    source_id = Column(BigInteger, ForeignKey("sources.id"), nullable=False)
+    snippet = Column(Text, nullable=True)
+
+
+class SearchCacheEntry(Base):
+    __tablename__ = "search_cache"
+
+    key = Column(String(64), primary_key=True)
+    query = Column(Text, nullable=False)
+    results = Column(JSONB, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
@@ -28,6 +28,7 @@ class MessageResponse(BaseModel):
     content: str
     thinking_steps: list[ThinkingStep] = []
     sources: list[Source] = []
+    status: str = "complete"
     created_at: datetime
 
     class Config:
@@ -59,6 +60,21 @@ class ChatListResponse(BaseModel):
         from_attributes = True
 
 
+class SearchHit(BaseModel):
+    chat_id: UUID
+    chat_title: Optional[str]
+    message_id: Optional[UUID] = None  # None when the hit is the chat title
+    role: Optional[str] = None
+    snippet: str
+    rank: float
+    created_at: datetime
+
+
+class SearchResponse(BaseModel):
+    results: list[SearchHit]
+    next_offset: Optional[int] = None
+
+
 # SSE Event schemas
 class SSEThinkingEvent(BaseModel):
     step: ThinkingStep
@@ -1,3 +1,18 @@
+from app.services.admission import AdmissionController, AdmissionRejected, admission
 from app.services.chat_service import ChatService
+from app.services.run_manager import AgentRun, RunManager, run_manager
+from app.services.search_cache import SearchCache, search_cache
+from app.services.single_flight import SingleFlight
 
-__all__ = ["ChatService"]
+__all__ = [
+    "AdmissionController",
+    "AdmissionRejected",
+    "admission",
+    "ChatService",
+    "AgentRun",
+    "RunManager",
+    "run_manager",
+    "SearchCache",
+    "search_cache",
+    "SingleFlight",
+]
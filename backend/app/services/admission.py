@@ -0,0 +1,114 @@
+import asyncio
+import time
+from collections import deque
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class AdmissionRejected(Exception):
+    """Raised when both the run slots and the wait queue are full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many concurrent requests")
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A caller's place in line for an agent run slot."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.admitted = False
+        self.released = False
+        self.enqueued_at = time.monotonic()
+
+    def position(self) -> int:
+        """1-based position in the wait queue, or 0 once admitted."""
+        if self.admitted:
+            return 0
+        return self.controller._queue.index(self) + 1
+
+    async def wait_for_update(self):
+        """Wait until the queue moves."""
+        await self.controller._changed.wait()
+
+    def release(self):
+        """Give up the slot, or the place in the queue."""
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Limits concurrent agent runs, with a bounded FIFO wait queue."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, retry_after: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self._queue: deque[AdmissionTicket] = deque()
+        self._changed = asyncio.Event()
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def admit(self) -> AdmissionTicket:
+        """Take a run slot, or a place in the queue if all slots are busy.
+
+        Raises AdmissionRejected when the queue is full as well.
+        """
+        ticket = AdmissionTicket(self)
+        if self.active < self.max_concurrent and not self._queue:
+            self._grant(ticket)
+        elif len(self._queue) < self.max_queue:
+            self._queue.append(ticket)
+        else:
+            self.rejected_total += 1
+            raise AdmissionRejected(self.retry_after)
+        return ticket
+
+    def stats(self) -> dict:
+        """Queue depth and wait time figures."""
+        return {
+            "active": self.active,
+            "queued": len(self._queue),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.admitted_total
+                if self.admitted_total
+                else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+    def _grant(self, ticket: AdmissionTicket):
+        ticket.admitted = True
+        self.active += 1
+        self.admitted_total += 1
+        waited = time.monotonic() - ticket.enqueued_at
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _release(self, ticket: AdmissionTicket):
+        if ticket.admitted:
+            self.active -= 1
+        else:
+            self._queue.remove(ticket)
+        while self._queue and self.active < self.max_concurrent:
+            self._grant(self._queue.popleft())
+        # Wake every queued caller so they can report their new position
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+admission = AdmissionController(
+    max_concurrent=settings.max_concurrent_runs,
+    max_queue=settings.max_queued_runs,
+    retry_after=settings.queue_retry_after_seconds,
+)
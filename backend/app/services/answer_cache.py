@@ -0,0 +1,162 @@
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+from app.config import get_settings
+
+settings = get_settings()
+
+# Common words that carry no meaning for matching research questions
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from how i in is it me "
+    "of on or please tell the to was what when where which who why will with "
+    "would you".split()
+)
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1234)
+_COEFFS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)
+]
+
+
+def question_tokens(text: str) -> frozenset[str]:
+    """Normalized content words of a question."""
+    words = re.findall(r"\w+", text.lower())
+    content = frozenset(w for w in words if len(w) > 1 and w not in STOPWORDS)
+    return content or frozenset(words)
+
+
+def minhash(tokens: frozenset[str]) -> tuple[int, ...]:
+    """MinHash signature of a token set."""
+    hashes = [zlib.crc32(token.encode()) for token in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _COEFFS)
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    """Exact Jaccard similarity of two token sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    tokens: frozenset[str]
+    content: str
+    sources: list
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class AnswerCache:
+    """Near-duplicate lookup of recent first-turn questions and their answers.
+
+    Questions are indexed by MinHash signatures with LSH banding, so a lookup
+    only compares against candidates that share a band. Candidates are then
+    scored by exact Jaccard similarity of their content words. A hit needs a
+    similarity of at least ``threshold`` and an answer younger than
+    ``ttl_seconds``.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, tuple[CachedAnswer, list]] = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        # Best similarity per lookup, in tenths, to help tune the threshold
+        self.similarity_histogram = [0] * 11
+
+    def lookup(self, question: str) -> Optional[CachedAnswer]:
+        """Find a fresh cached answer to a near-duplicate question."""
+        tokens = question_tokens(question)
+        if not tokens:
+            # Nothing to match on, e.g. a question made only of punctuation
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        best, best_score = None, 0.0
+        for entry_id in self._candidates(minhash(tokens)):
+            entry, _ = self._entries[entry_id]
+            if now - entry.created_at > self.ttl_seconds:
+                continue
+            score = jaccard(tokens, entry.tokens)
+            if score > best_score:
+                best, best_score = entry, score
+
+        self.similarity_histogram[int(best_score * 10)] += 1
+        if best is not None and best_score >= self.threshold:
+            self.hits += 1
+            return best
+        self.misses += 1
+        return None
+
+    def store(self, question: str, content: str, sources: list):
+        """Remember the answer to a first-turn question."""
+        tokens = question_tokens(question)
+        if not tokens:
+            return
+        band_keys = self._band_keys(minhash(tokens))
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (
+            CachedAnswer(question, tokens, content, sources),
+            band_keys,
+        )
+        for key in band_keys:
+            self._buckets.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def stats(self) -> dict:
+        """Hit rate, threshold and similarity distribution."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "best_similarity_histogram": {
+                f"{i / 10:.1f}": count
+                for i, count in enumerate(self.similarity_histogram)
+            },
+        }
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple]:
+        return [
+            (band, signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND])
+            for band in range(BANDS)
+        ]
+
+    def _candidates(self, signature: tuple[int, ...]) -> set[int]:
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        return candidates
+
+    def _evict_oldest(self):
+        entry_id, (_, band_keys) = self._entries.popitem(last=False)
+        for key in band_keys:
+            bucket = self._buckets[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+
+
+answer_cache = AnswerCache(
+    threshold=settings.answer_cache_threshold,
+    ttl_seconds=settings.answer_cache_ttl_seconds,
+    max_entries=settings.answer_cache_max_entries,
+)
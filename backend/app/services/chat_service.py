@@ -1,15 +1,158 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from operator import itemgetter
 from uuid import UUID
-from typing import Optional
-from sqlalchemy import select, desc
+from typing import AsyncIterator, Iterator, Optional
+from sqlalchemy import (
+    Integer,
+    String,
+    Text,
+    any_,
+    bindparam,
+    cast,
+    column,
+    delete,
+    desc,
+    func,
+    insert,
+    null,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import (
+    ARRAY,
+    UUID as PG_UUID,
+    aggregate_order_by,
+    insert as pg_insert,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from app.models.database import Chat, Message
+from sqlalchemy.orm import raiseload
+from app.config import get_settings
+from app.models.database import Chat, Message, MessageSource, SourceRecord
+from app.services.metrics import observe_db
+from app.services.urls import canonical_url
+
+settings = get_settings()
+
+# ts_headline options for search result snippets
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+# Most bind parameters asyncpg accepts in one statement
+MAX_BIND_PARAMS = 32767
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def source_records(sources: list) -> tuple[dict, list]:
+    """Split sources into rows for ``sources``, keyed by canonical URL, and
+    ``(canonical_url, position, snippet)`` links in their original order."""
+    records = {}
+    links = []
+    for position, source in enumerate(sources):
+        key = canonical_url(source["url"])
+        records.setdefault(key, {
+            "canonical_url": key,
+            "url": source["url"],
+            "title": source.get("title") or "",
+            "domain": source.get("domain") or "",
+        })
+        links.append((key, position, source.get("snippet")))
+    return records, links
+
+
+def chunked(rows: list, table) -> Iterator[list]:
+    """Split rows for a multi-row insert into ``table`` so that no statement
+    goes over the bind parameter limit."""
+    size = MAX_BIND_PARAMS // len(table.columns)
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def upsert_sources(records: list[dict]):
+    """Upsert sources in canonical URL order, returning ``(id, canonical_url)``
+    of new or retitled rows; look up the others with ``existing_sources``."""
+    stmt = pg_insert(SourceRecord).values(
+        sorted(records, key=itemgetter("canonical_url"))
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[SourceRecord.canonical_url],
+        set_={"title": stmt.excluded.title},
+        where=SourceRecord.title.is_distinct_from(stmt.excluded.title),
+    ).returning(SourceRecord.id, SourceRecord.canonical_url)
+
+
+def existing_sources(keys: list[str]):
+    """Select ``(id, canonical_url)`` of the sources with these canonical URLs."""
+    return select(SourceRecord.id, SourceRecord.canonical_url).where(
+        SourceRecord.canonical_url == any_(bindparam("source_keys", keys, type_=ARRAY(Text)))
+    )
+
+
+def linked_sources():
+    """Correlated subquery rebuilding a message's sources, falling back to
+    the legacy JSONB column for messages not yet backfilled."""
+    linked = (
+        select(
+            func.jsonb_agg(
+                aggregate_order_by(
+                    func.jsonb_build_object(
+                        "url", SourceRecord.url,
+                        "title", SourceRecord.title,
+                        "domain", SourceRecord.domain,
+                        "snippet", MessageSource.snippet,
+                    ),
+                    MessageSource.position,
+                )
+            )
+        )
+        .join_from(MessageSource, SourceRecord, SourceRecord.id == MessageSource.source_id)
+        .where(MessageSource.message_id == Message.id)
+        .scalar_subquery()
+    )
+    return func.coalesce(linked, Message.sources).label("sources")
+
+
+def message_columns() -> list:
+    """Columns selected for messages on the read path."""
+    return [
+        Message.id,
+        Message.chat_id,
+        Message.role,
+        Message.content,
+        Message.thinking_steps,
+        linked_sources(),
+        Message.status,
+        Message.created_at,
+        Message.sequence_num,
+    ]
+
+
+def encode_cursor(*values) -> str:
+    """Encode keyset values into an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode an opaque cursor string back into keyset values."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
 
 
 class ChatService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    @observe_db
     async def create_chat(self, title: Optional[str] = None) -> Chat:
         """Create a new chat."""
         chat = Chat(title=title)
@@ -18,41 +161,66 @@ class ChatService:
         await self.db.refresh(chat)
         return chat
 
+    @observe_db
     async def get_chat(self, chat_id: UUID) -> Optional[Chat]:
-        """Get a chat by ID with all messages."""
+        """Get a chat by ID without its messages."""
         result = await self.db.execute(
             select(Chat)
-            .options(selectinload(Chat.messages))
+            .options(raiseload(Chat.messages))
             .where(Chat.id == chat_id)
         )
         return result.scalar_one_or_none()
 
-    async def list_chats(self) -> list[Chat]:
-        """List all chats ordered by updated_at descending."""
-        result = await self.db.execute(
-            select(Chat).order_by(desc(Chat.updated_at))
-        )
-        return list(result.scalars().all())
+    @observe_db
+    async def list_chats(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> tuple[list, Optional[str]]:
+        """List chats by updated_at descending, as rows with the next page cursor."""
+        query = select(Chat.id, Chat.title, Chat.created_at, Chat.updated_at)
+        if cursor is not None:
+            try:
+                updated_at, chat_id = decode_cursor(cursor)
+                key = (datetime.fromisoformat(updated_at), UUID(chat_id))
+            except (ValueError, TypeError) as e:
+                raise InvalidCursorError("Invalid cursor") from e
+            query = query.where(tuple_(Chat.updated_at, Chat.id) < key)
+        query = query.order_by(desc(Chat.updated_at), desc(Chat.id))
+        if limit is not None:
+            query = query.limit(limit + 1)
 
+        result = await self.db.execute(query)
+        chats = list(result.all())
+        if limit is None or len(chats) <= limit:
+            return chats, None
+        chats = chats[:limit]
+        last = chats[-1]
+        return chats, encode_cursor(last.updated_at.isoformat(), str(last.id))
+
+    @observe_db
     async def delete_chat(self, chat_id: UUID) -> bool:
         """Delete a chat by ID."""
-        chat = await self.get_chat(chat_id)
-        if not chat:
-            return False
-        await self.db.delete(chat)
-        await self.db.flush()
-        return True
-
-    async def delete_all_chats(self) -> int:
-        """Delete all chats and return count of deleted chats."""
-        result = await self.db.execute(select(Chat))
-        chats = list(result.scalars().all())
-        count = len(chats)
-        for chat in chats:
-            await self.db.delete(chat)
-        await self.db.flush()
-        return count
+        result = await self.db.execute(delete(Chat).where(Chat.id == chat_id))
+        return result.rowcount > 0
+
+    @observe_db
+    async def delete_chats_batch(
+        self,
+        older_than: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """Delete up to ``batch_size`` chats and return the count. The caller commits."""
+        batch_size = batch_size or settings.delete_batch_size
+        condition = Chat.updated_at < older_than if older_than is not None else true()
+        batch = (
+            select(Chat.id)
+            .where(condition)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(delete(Chat).where(Chat.id.in_(batch)))
+        return result.rowcount
 
+    @observe_db
     async def update_chat_title(self, chat_id: UUID, title: str) -> Optional[Chat]:
         """Update a chat's title."""
         chat = await self.get_chat(chat_id)
@@ -63,32 +231,349 @@ class ChatService:
         await self.db.refresh(chat)
         return chat
 
-    async def add_message(
+    @observe_db
+    async def save_message(
         self,
         chat_id: UUID,
         role: str,
         content: str,
         thinking_steps: list = None,
         sources: list = None,
-    ) -> Message:
-        """Add a message to a chat."""
-        message = Message(
-            chat_id=chat_id,
-            role=role,
-            content=content,
-            thinking_steps=thinking_steps or [],
-            sources=sources or [],
+        title: Optional[str] = None,
+        message_id: Optional[UUID] = None,
+        status: str = "complete",
+    ) -> UUID:
+        """Insert a message, touch its chat and link its sources in one statement.
+        Returns the message ID. The caller commits."""
+        new_message = (
+            insert(Message)
+            .values(
+                id=message_id or uuid.uuid4(),
+                chat_id=chat_id,
+                role=role,
+                content=content,
+                thinking_steps=thinking_steps or [],
+                sources=[],
+                status=status,
+                created_at=func.now(),
+            )
+            .returning(Message.id)
+            .cte("new_message")
         )
-        self.db.add(message)
-        await self.db.flush()
-        await self.db.refresh(message)
-        return message
+        chat_values = {"updated_at": func.now()}
+        if title is not None:
+            chat_values["title"] = title
+        touched_chat = (
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(**chat_values)
+            .returning(Chat.id)
+            .cte("touched_chat")
+        )
+        query = select(new_message.c.id).add_cte(touched_chat)
+        if not sources:
+            result = await self.db.execute(query)
+            return result.scalar_one()
+
+        linked = self._link_sources(new_message, sources)
+        query = query.add_columns(
+            select(func.count()).select_from(linked).scalar_subquery().label("linked")
+        )
+        new_id, linked_count = (await self.db.execute(query)).one()
+        if linked_count < len(sources):
+            # A source first inserted by a concurrent transaction is not in
+            # this statement's snapshot; link the rest in separate statements
+            await self.link_sources([(new_id, sources)])
+        return new_id
 
-    async def get_chat_messages(self, chat_id: UUID) -> list[Message]:
-        """Get all messages for a chat."""
+    @staticmethod
+    def _link_sources(new_message, sources: list):
+        """CTEs upserting sources and linking them to the new message."""
+        records, links = source_records(sources)
+        upserted = upsert_sources(list(records.values())).cte("upserted_sources")
+        # Rows the upsert left alone come from the snapshot instead
+        source_ids = union_all(
+            select(upserted.c.id, upserted.c.canonical_url),
+            existing_sources(list(records)).where(
+                SourceRecord.canonical_url.not_in(select(upserted.c.canonical_url))
+            ),
+        ).cte("source_ids")
+        link_values = (
+            values(
+                column("canonical_url", Text),
+                column("position", Integer),
+                column("snippet", Text),
+                name="link_values",
+            )
+            .data(links)
+        )
+        return (
+            insert(MessageSource)
+            .from_select(
+                ["message_id", "position", "source_id", "snippet"],
+                select(
+                    new_message.c.id,
+                    link_values.c.position,
+                    source_ids.c.id,
+                    link_values.c.snippet,
+                )
+                .join_from(
+                    link_values, source_ids, source_ids.c.canonical_url == link_values.c.canonical_url
+                )
+                .join(new_message, true()),
+            )
+            .returning(MessageSource.position)
+            .cte("linked_sources")
+        )
+
+    @observe_db
+    async def link_sources(self, messages: list[tuple[UUID, list]]) -> None:
+        """Upsert the sources of several messages and link them."""
+        records = {}
+        links = []
+        for message_id, sources in messages:
+            message_records, message_links = source_records(sources)
+            for key, record in message_records.items():
+                records.setdefault(key, record)
+            links.extend((message_id, *link) for link in message_links)
+        if not links:
+            return
+
+        source_ids = {}
+        ordered = sorted(records.values(), key=itemgetter("canonical_url"))
+        for chunk in chunked(ordered, SourceRecord.__table__):
+            result = await self.db.execute(upsert_sources(chunk))
+            source_ids.update((key, source_id) for source_id, key in result.all())
+        missing = [key for key in records if key not in source_ids]
+        if missing:
+            result = await self.db.execute(existing_sources(missing))
+            source_ids.update((key, source_id) for source_id, key in result.all())
+        rows = [
+            {
+                "message_id": message_id,
+                "position": position,
+                "source_id": source_ids[key],
+                "snippet": snippet,
+            }
+            for message_id, key, position, snippet in links
+        ]
+        for chunk in chunked(rows, MessageSource.__table__):
+            await self.db.execute(
+                pg_insert(MessageSource).values(chunk).on_conflict_do_nothing()
+            )
+
+    @observe_db
+    async def get_message(self, message_id: UUID):
+        """Get a single message by ID, as a plain row with its sources."""
         result = await self.db.execute(
-            select(Message)
-            .where(Message.chat_id == chat_id)
-            .order_by(Message.sequence_num)
+            select(*message_columns()).where(Message.id == message_id)
         )
+        return result.one_or_none()
+
+    @observe_db
+    async def get_chat_messages(
+        self,
+        chat_id: UUID,
+        after_sequence: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> list[Message]:
+        """Get messages for a chat, optionally only those after a sequence number."""
+        query = select(Message).where(Message.chat_id == chat_id)
+        if after_sequence is not None:
+            query = query.where(Message.sequence_num > after_sequence)
+        query = query.order_by(Message.sequence_num)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await self.db.execute(query)
         return list(result.scalars().all())
+
+    @observe_db
+    async def get_messages_page(
+        self,
+        chat_id: UUID,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> tuple[list, Optional[str]]:
+        """Get one page of a chat's messages, as rows with the next page cursor."""
+        query = select(*message_columns()).where(Message.chat_id == chat_id)
+        if cursor is not None:
+            try:
+                (after_sequence,) = decode_cursor(cursor)
+                after_sequence = int(after_sequence)
+            except (ValueError, TypeError) as e:
+                raise InvalidCursorError("Invalid cursor") from e
+            query = query.where(Message.sequence_num > after_sequence)
+        query = query.order_by(Message.sequence_num)
+        if limit is not None:
+            query = query.limit(limit + 1)
+
+        result = await self.db.execute(query)
+        messages = list(result.all())
+        if limit is None or len(messages) <= limit:
+            return messages, None
+        messages = messages[:limit]
+        return messages, encode_cursor(messages[-1].sequence_num)
+
+    @observe_db
+    async def search(self, q: str, limit: int, offset: int = 0) -> tuple[list, bool]:
+        """Full-text search over messages and chat titles; returns hits and whether more follow."""
+        query = func.websearch_to_tsquery("english", q)
+        message_hits = select(
+            Message.chat_id,
+            Message.id.label("message_id"),
+            Message.role,
+            Message.created_at,
+            func.ts_rank(Message.search_vector, query).label("rank"),
+        ).where(Message.search_vector.op("@@")(query))
+        title_hits = select(
+            Chat.id.label("chat_id"),
+            cast(null(), PG_UUID(as_uuid=True)).label("message_id"),
+            cast(null(), String).label("role"),
+            Chat.created_at,
+            (func.ts_rank(Chat.title_vector, query) * 2).label("rank"),
+        ).where(Chat.title_vector.op("@@")(query))
+        hits = union_all(message_hits, title_hits).subquery("hits")
+        page = (
+            select(hits)
+            .order_by(desc(hits.c.rank), desc(hits.c.created_at))
+            .limit(limit + 1)
+            .offset(offset)
+            .subquery("page")
+        )
+
+        result = await self.db.execute(
+            select(
+                page.c.chat_id,
+                Chat.title.label("chat_title"),
+                page.c.message_id,
+                page.c.role,
+                func.ts_headline(
+                    "english",
+                    func.coalesce(Message.content, Chat.title),
+                    query,
+                    HEADLINE_OPTIONS,
+                ).label("snippet"),
+                page.c.rank,
+                page.c.created_at,
+            )
+            .select_from(page)
+            .join(Chat, Chat.id == page.c.chat_id)
+            .outerjoin(Message, Message.id == page.c.message_id)
+            .order_by(desc(page.c.rank), desc(page.c.created_at))
+        )
+        rows = list(result.all())
+        return rows[:limit], len(rows) > limit
+
+    @observe_db
+    async def get_chat_summary(self, chat_id: UUID) -> tuple[Optional[str], Optional[int]]:
+        """Get a chat's rolling summary and the last sequence number it covers."""
+        result = await self.db.execute(
+            select(Chat.summary, Chat.summary_through_seq).where(Chat.id == chat_id)
+        )
+        row = result.one_or_none()
+        return (row.summary, row.summary_through_seq) if row else (None, None)
+
+    @observe_db
+    async def update_chat_summary(
+        self, chat_id: UUID, summary: str, through_seq: int
+    ) -> None:
+        """Store a chat's rolling summary."""
+        await self.db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(summary=summary, summary_through_seq=through_seq)
+        )
+        await self.db.flush()
+
+    async def export_rows(
+        self,
+        since: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator:
+        """Stream every chat joined with its messages from a server-side cursor."""
+        query = (
+            select(
+                Chat.id.label("chat_id"),
+                Chat.title,
+                Chat.created_at.label("chat_created_at"),
+                Chat.updated_at,
+                Message.id,
+                Message.role,
+                Message.content,
+                Message.thinking_steps,
+                linked_sources(),
+                Message.status,
+                Message.created_at,
+            )
+            .outerjoin(Message, Message.chat_id == Chat.id)
+            .order_by(Chat.id, Message.sequence_num)
+            .execution_options(yield_per=batch_size or settings.export_batch_size)
+        )
+        if since is not None:
+            query = query.where(Chat.updated_at >= since)
+
+        result = await self.db.stream(query)
+        async for row in result:
+            yield row
+
+    async def import_records(
+        self,
+        records: AsyncIterator[dict],
+        batch_size: Optional[int] = None,
+    ) -> dict:
+        """Bulk upsert chats and messages in the export format, committing per batch."""
+        batch_size = batch_size or settings.import_batch_size
+        chats: list[dict] = []
+        messages: list[dict] = []
+        counts = {"chats": 0, "messages": 0}
+
+        async def flush():
+            for chunk in chunked(chats, Chat.__table__):
+                stmt = pg_insert(Chat).values(chunk)
+                result = await self.db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[Chat.id],
+                        set_={"title": stmt.excluded.title},
+                    )
+                )
+                counts["chats"] += result.rowcount
+            inserted = set()
+            for chunk in chunked(messages, Message.__table__):
+                result = await self.db.execute(
+                    pg_insert(Message)
+                    .values([{**m, "sources": []} for m in chunk])
+                    .on_conflict_do_nothing()
+                    .returning(Message.id)
+                )
+                inserted.update(result.scalars().all())
+            counts["messages"] += len(inserted)
+            await self.link_sources([
+                (m["id"], m["sources"]) for m in messages if m["id"] in inserted
+            ])
+            await self.db.commit()
+            chats.clear()
+            messages.clear()
+
+        async for record in records:
+            if record["type"] == "chat":
+                chats.append({
+                    "id": UUID(record["id"]),
+                    "title": record.get("title"),
+                    "created_at": datetime.fromisoformat(record["created_at"]),
+                    "updated_at": datetime.fromisoformat(record["updated_at"]),
+                })
+            else:
+                messages.append({
+                    "id": UUID(record["id"]),
+                    "chat_id": UUID(record["chat_id"]),
+                    "role": record["role"],
+                    "content": record["content"],
+                    "thinking_steps": record.get("thinking_steps") or [],
+                    "sources": record.get("sources") or [],
+                    "status": record.get("status", "complete"),
+                    "created_at": datetime.fromisoformat(record["created_at"]),
+                })
+            if len(chats) + len(messages) >= batch_size:
+                await flush()
+        await flush()
+        return counts
@@ -0,0 +1,115 @@
+import functools
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from app.database import engine
+
+# Seconds; covers fast DB reads up to full agent turns
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+ANTHROPIC_LATENCY = Histogram(
+    "pantheon_anthropic_request_seconds",
+    "Duration of successful Anthropic calls",
+    ["model", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+TAVILY_LATENCY = Histogram(
+    "pantheon_tavily_request_seconds",
+    "Duration of Tavily search requests",
+    buckets=LATENCY_BUCKETS,
+)
+DB_LATENCY = Histogram(
+    "pantheon_db_operation_seconds",
+    "Duration of ChatService database operations",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+SSE_FIRST_BYTE = Histogram(
+    "pantheon_sse_first_byte_seconds",
+    "Time from a new message's request to the agent's first SSE event",
+    buckets=LATENCY_BUCKETS,
+)
+SSE_FIRST_CONTENT = Histogram(
+    "pantheon_sse_first_content_seconds",
+    "Time from the start of an agent run to its first answer text",
+    buckets=LATENCY_BUCKETS,
+)
+
+TOKENS = Counter(
+    "pantheon_tokens",
+    "Anthropic tokens by model and kind (input, output, cache_read, cache_creation)",
+    ["model", "kind"],
+)
+TOOL_CALLS = Counter("pantheon_tool_calls", "Tool calls made by the agent", ["tool"])
+TOOL_CALLS_PER_ANSWER = Histogram(
+    "pantheon_tool_calls_per_answer",
+    "Tool calls made while producing one answer",
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16),
+)
+PLANNING_DECISIONS = Counter(
+    "pantheon_planning_decisions",
+    "Outcome of the planning turn: search first, or answer directly",
+    ["decision"],
+)
+SPECULATIVE_SEARCHES = Counter(
+    "pantheon_speculative_searches",
+    "Speculative searches by outcome: hit, unused or cancelled",
+    ["outcome"],
+)
+PROVIDER_ERRORS = Counter(
+    "pantheon_provider_errors",
+    "Failed provider calls, including ones that were retried",
+    ["provider", "error"],
+)
+
+RUNS_ABORTED = Counter(
+    "pantheon_runs_aborted", "Agent runs cancelled because every client went away"
+)
+
+ACTIVE_STREAMS = Gauge("pantheon_active_streams", "SSE streams open to clients")
+DB_POOL_CHECKED_OUT = Gauge(
+    "pantheon_db_pool_checked_out", "Database connections checked out of the pool"
+)
+DB_POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
+
+
+def record_usage(response):
+    """Count the tokens of one Anthropic response."""
+    usage = response.usage
+    model = response.model
+    TOKENS.labels(model, "input").inc(usage.input_tokens)
+    TOKENS.labels(model, "output").inc(usage.output_tokens)
+    TOKENS.labels(model, "cache_read").inc(usage.cache_read_input_tokens or 0)
+    TOKENS.labels(model, "cache_creation").inc(usage.cache_creation_input_tokens or 0)
+
+
+def record_error(provider: str, exc: Exception):
+    """Count a failed provider call by exception type."""
+    PROVIDER_ERRORS.labels(provider, type(exc).__name__).inc()
+
+
+def observe_db(fn):
+    """Time an async ChatService method under its own name."""
+    histogram = DB_LATENCY.labels(fn.__name__)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def render() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+import anthropic
+import httpx
+from app.config import get_settings
+from app.services.metrics import record_error
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Status codes worth retrying: rate limits, overload and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Monotonic deadline of the request being served, shared by all its provider calls
+_deadline: ContextVar[Optional[float]] = ContextVar("retry_deadline", default=None)
+
+
+class TokenBucket:
+    """Paces calls to a provider at ``rate`` per second with bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a call is allowed."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+pacers = {
+    "anthropic": TokenBucket(settings.anthropic_rate_limit, settings.anthropic_burst),
+    "tavily": TokenBucket(settings.tavily_rate_limit, settings.tavily_burst),
+}
+
+
+def set_latency_budget(seconds: float):
+    """Start the total latency budget for the current request."""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left in the current request's latency budget, if one is set."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    if isinstance(exc, anthropic.APIStatusError):
+        return exc.status_code
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Whether an error is transient: timeouts, dropped connections, 429/529/5xx."""
+    if isinstance(exc, (anthropic.APIConnectionError, httpx.TransportError)):
+        return True
+    return _status_code(exc) in RETRYABLE_STATUS_CODES
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from its retry-after header."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+    """Delay before retrying after failed ``attempt`` (1-based), or None to give up.
+
+    Uses full-jitter exponential backoff unless the provider sent retry-after.
+    Gives up on errors that are not transient, after ``retry_max_attempts``,
+    or when the wait would overrun the request's latency budget.
+    """
+    if not is_retryable(exc) or attempt >= settings.retry_max_attempts:
+        return None
+    delay = retry_after(exc)
+    if delay is None:
+        backoff = settings.retry_base_delay * 2 ** (attempt - 1)
+        delay = random.uniform(0, min(settings.retry_max_delay, backoff))
+    remaining = time_remaining()
+    if remaining is not None and delay >= remaining:
+        return None
+    return delay
+
+
+async def call_with_retry(provider: str, fn: Callable[[], Awaitable[T]]) -> T:
+    """Call ``fn`` paced by the provider's token bucket, retrying transient errors."""
+    attempt = 0
+    while True:
+        attempt += 1
+        await pacers[provider].acquire()
+        try:
+            return await fn()
+        except Exception as e:
+            record_error(provider, e)
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+            print(f"{provider} call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,188 @@
+import asyncio
+from collections import deque
+from typing import AsyncGenerator, AsyncIterator, Optional
+from uuid import UUID
+from app.config import get_settings
+from app.services.metrics import RUNS_ABORTED
+from app.services.sse import format_sse, with_event_id
+
+settings = get_settings()
+
+
+class AgentRun:
+    """A server-side agent run whose SSE events are buffered for replay.
+
+    Each event gets a monotonic ID. The newest ``buffer_size`` events are
+    kept in a ring buffer, so a client that reconnects with ``Last-Event-ID``
+    can pick up where it left off.
+
+    When ``abandon_after`` is set, a run that has had no subscribers for
+    that many seconds is cancelled and marked as aborted.
+    """
+
+    def __init__(
+        self,
+        run_id: UUID,
+        chat_id: UUID,
+        buffer_size: int,
+        abandon_after: Optional[float] = None,
+    ):
+        self.run_id = run_id
+        self.chat_id = chat_id
+        self.events: deque[tuple[int, str]] = deque(maxlen=buffer_size)
+        self.last_event_id = 0
+        self.done = False
+        self.aborted = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.abandon_after = abandon_after
+        self._abandon_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str):
+        """Buffer one formatted SSE chunk and wake subscribers."""
+        self.last_event_id += 1
+        self.events.append((self.last_event_id, chunk))
+        self._notify()
+
+    def finish(self):
+        """Mark the run as finished and wake subscribers."""
+        self.done = True
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+        self._notify()
+
+    def abort(self):
+        """Cancel the run's task; the producer persists what it has so far."""
+        if self.done or self.task is None:
+            return
+        self.aborted = True
+        self.task.cancel()
+
+    def watch_subscribers(self):
+        """Start the abandon timer if nobody is listening."""
+        if self.abandon_after is None or self.done or self.subscribers:
+            return
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+        self._abandon_timer = asyncio.get_running_loop().call_later(
+            self.abandon_after, self._abandon
+        )
+
+    def _abandon(self):
+        self._abandon_timer = None
+        if not self.subscribers and not self.done:
+            print(f"Agent run {self.run_id} abandoned by its clients, aborting")
+            RUNS_ABORTED.inc()
+            self.abort()
+
+    def can_replay_from(self, last_event_id: int) -> bool:
+        """Whether every event after ``last_event_id`` is still buffered."""
+        if not self.events:
+            return True
+        return self.events[0][0] <= last_event_id + 1
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncGenerator[str, None]:
+        """Yield buffered and live events after ``last_event_id`` with SSE ids.
+
+        If events the subscriber has not seen were already dropped from the
+        buffer, a ``gap`` event with the missing ID range comes first, so
+        the client knows its partial answer is incomplete and can reload the
+        stored message once the run finishes.
+        """
+        self.subscribers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+        try:
+            while True:
+                changed = self._changed
+                for event_id, chunk in list(self.events):
+                    if event_id > last_event_id + 1:
+                        gap = {"type": "gap", "from": last_event_id + 1, "to": event_id - 1}
+                        yield format_sse("gap", gap)
+                    if event_id > last_event_id:
+                        last_event_id = event_id
+                        yield with_event_id(chunk, event_id)
+                if self.done and last_event_id >= self.last_event_id:
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            self.watch_subscribers()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class RunManager:
+    """Runs agent work as background tasks that outlive the HTTP connection."""
+
+    def __init__(
+        self,
+        buffer_size: int = 5000,
+        retention_seconds: float = 300.0,
+        abandon_after: Optional[float] = None,
+    ):
+        self.buffer_size = buffer_size
+        self.retention_seconds = retention_seconds
+        self.abandon_after = abandon_after
+        self._runs: dict[UUID, AgentRun] = {}
+
+    def start(
+        self, run_id: UUID, chat_id: UUID, producer: AsyncIterator[str]
+    ) -> AgentRun:
+        """Start consuming ``producer`` in a background task.
+
+        The abandon timer starts right away, so a client that disconnects
+        before subscribing does not leave the run going.
+        """
+        run = AgentRun(run_id, chat_id, self.buffer_size, self.abandon_after)
+        run.task = asyncio.create_task(self._drive(run, producer))
+        self._runs[run_id] = run
+        run.watch_subscribers()
+        return run
+
+    def get(self, run_id: UUID) -> Optional[AgentRun]:
+        """Get a run that is in progress or recently finished."""
+        return self._runs.get(run_id)
+
+    def active_count(self) -> int:
+        """Number of runs still in progress."""
+        return sum(1 for run in self._runs.values() if not run.done)
+
+    async def shutdown(self):
+        """Abort runs still in progress."""
+        runs = [run for run in self._runs.values() if run.task and not run.done]
+        for run in runs:
+            run.abort()
+        await asyncio.gather(*(run.task for run in runs), return_exceptions=True)
+        self._runs.clear()
+
+    async def _drive(self, run: AgentRun, producer: AsyncIterator[str]):
+        try:
+            async for chunk in producer:
+                run.publish(chunk)
+        except Exception as e:
+            print(f"Agent run {run.run_id} failed: {e}")
+            run.publish(format_sse("error", {"message": str(e)}))
+        except asyncio.CancelledError:
+            if run.aborted:
+                run.publish(format_sse("aborted", {"message_id": str(run.run_id)}))
+            raise
+        finally:
+            run.finish()
+            # Keep finished runs around briefly for reconnecting clients
+            asyncio.get_running_loop().call_later(
+                self.retention_seconds, self._runs.pop, run.run_id, None
+            )
+
+
+run_manager = RunManager(
+    buffer_size=settings.run_event_buffer_size,
+    retention_seconds=settings.run_retention_seconds,
+    abandon_after=(
+        settings.run_abandon_grace_seconds if settings.abort_abandoned_runs else None
+    ),
+)
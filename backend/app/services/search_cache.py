@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models.database import SearchCacheEntry
+
+settings = get_settings()
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def make_cache_key(query: str, params: dict) -> str:
+    """Build a stable cache key from the normalized query and search parameters."""
+    payload = json.dumps(
+        {"query": normalize_query(query), "params": params}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SearchCache:
+    """Two-tier cache for web search results.
+
+    The first tier is a bounded in-process LRU with a TTL. The optional second
+    tier is a Postgres table, so warm results survive restarts and are shared
+    between workers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        persistent: bool = False,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[list[dict]]:
+        """Look up cached results, checking memory first and then Postgres."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, results = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return results
+            del self._entries[key]
+
+        if self.persistent:
+            results = await self._db_get(key)
+            if results is not None:
+                self._remember(key, results)
+                self.db_hits += 1
+                return results
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, query: str, results: list[dict]):
+        """Store results in both tiers."""
+        self._remember(key, results)
+        if self.persistent:
+            await self._db_set(key, query, results)
+
+    def clear(self):
+        """Drop all in-memory entries."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit and miss counters for both tiers."""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        hits = self.memory_hits + self.db_hits
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key: str, results: list[dict]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _db_get(self, key: str) -> Optional[list[dict]]:
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(SearchCacheEntry.results).where(
+                        SearchCacheEntry.key == key,
+                        SearchCacheEntry.expires_at > datetime.now(timezone.utc),
+                    )
+                )
+                return result.scalar_one_or_none()
+        except Exception as e:
+            print(f"Search cache read error: {e}")
+            return None
+
+    async def _db_set(self, key: str, query: str, results: list[dict]):
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        stmt = insert(SearchCacheEntry).values(
+            key=key,
+            query=normalize_query(query),
+            results=results,
+            created_at=now,
+            expires_at=expires_at,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SearchCacheEntry.key],
+            set_={
+                "results": stmt.excluded.results,
+                "created_at": stmt.excluded.created_at,
+                "expires_at": stmt.excluded.expires_at,
+            },
+        )
+        try:
+            async with async_session_maker() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except Exception as e:
+            print(f"Search cache write error: {e}")
+
+    async def purge_expired(self) -> int:
+        """Delete expired rows from the persistent tier."""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                delete(SearchCacheEntry).where(
+                    SearchCacheEntry.expires_at <= datetime.now(timezone.utc)
+                )
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def purge_periodically(self, interval: float):
+        """Purge expired rows every ``interval`` seconds until cancelled."""
+        while True:
+            try:
+                purged = await self.purge_expired()
+                if purged:
+                    print(f"Purged {purged} expired search cache entries")
+            except Exception as e:
+                print(f"Search cache purge error: {e}")
+            await asyncio.sleep(interval)
+
+
+search_cache = SearchCache(
+    max_entries=settings.search_cache_max_entries,
+    ttl_seconds=settings.search_cache_ttl_seconds,
+    persistent=settings.search_cache_persistent,
+)
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller for a key starts the work. Later callers with the same
+    key await the same task until it finishes. An exception reaches every
+    waiter. Waiters await the task through ``asyncio.shield``, so a cancelled
+    waiter does not cancel the shared call while others still wait on it;
+    the call is cancelled only when its last waiter is.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` for ``key``, or join the call already in flight."""
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # Forget the call now rather than in the done callback, so a
+                # caller arriving meanwhile starts a fresh one instead of
+                # joining a task that is being cancelled
+                if self._calls.get(key) is task:
+                    del self._calls[key]
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        return len(self._calls)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,11 @@
+import json
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format one SSE event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def with_event_id(chunk: str, event_id: int) -> str:
+    """Prefix an already formatted SSE event with its ``id:`` line."""
+    return f"id: {event_id}\n{chunk}"
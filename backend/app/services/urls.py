@@ -0,0 +1,53 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "_hsenc",
+    "_hsmi",
+    "yclid",
+}
+
+
+def _is_tracking(param: str) -> bool:
+    return param.lower() in TRACKING_PARAMS or param.lower().startswith("utm_")
+
+
+def clean_url(url: str) -> str:
+    """Drop tracking parameters and the fragment, keeping the URL otherwise intact."""
+    parts = urlsplit(url.strip())
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(k)
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def canonical_url(url: str) -> str:
+    """Canonical form of a URL used to recognize the same page.
+
+    Ignores the scheme, a leading ``www.``, default ports, tracking
+    parameters, the fragment, a trailing slash and query parameter order.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(k)
+    )
+    return urlunsplit(("", host, path, urlencode(query), "")).lstrip("/")
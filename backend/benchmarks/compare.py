@@ -0,0 +1,60 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.1]
+
+Exits with status 1 when any latency percentile grows, or throughput
+drops, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_METRICS = ("latency_ms", "ttfe_ms", "ttfc_ms")
+PERCENTILES = ("p50", "p95", "p99")
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    """Print a side-by-side table and return the regressions found."""
+    regressions = []
+    for name, new_scenario in new["scenarios"].items():
+        base_scenario = base["scenarios"].get(name)
+        if base_scenario is None:
+            continue
+        rows = [
+            (f"{metric}.{p}", (base_scenario.get(metric) or {}).get(p), (new_scenario.get(metric) or {}).get(p), True)
+            for metric in LATENCY_METRICS
+            for p in PERCENTILES
+        ]
+        rows.append(("throughput_rps", base_scenario["throughput_rps"], new_scenario["throughput_rps"], False))
+        rows.append(("errors", base_scenario["errors"], new_scenario["errors"], True))
+
+        print(name)
+        for label, old, cur, lower_is_better in rows:
+            if old is None or cur is None:
+                continue
+            change = (cur - old) / old if old else 0.0
+            worse = change > threshold if lower_is_better else change < -threshold
+            if label == "errors":
+                worse = cur > old
+            flag = "  REGRESSION" if worse else ""
+            print(f"  {label:<18} {old:>10} -> {cur:>10} ({change:+.1%}){flag}")
+            if worse:
+                regressions.append(f"{name}.{label}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative change")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions")
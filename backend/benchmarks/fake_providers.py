@@ -0,0 +1,203 @@
+"""Local stand-ins for the Anthropic Messages API and Tavily search.
+
+Both are small FastAPI apps whose latency, token rate and tool-use pattern
+come from a FakeProviderConfig, so benchmark runs are reproducible and do
+not depend on (or pay for) the real providers.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeProviderConfig:
+    # Anthropic: delay before the first streamed token, then tokens per second
+    anthropic_first_token_ms: float = 400.0
+    anthropic_tokens_per_second: float = 80.0
+    answer_tokens: int = 200
+    # Tool-use pattern: rounds of web_search before the answer, searches per round
+    tool_rounds: int = 1
+    searches_per_round: int = 2
+    # Tavily: response latency, uniform jitter on top
+    tavily_latency_ms: float = 800.0
+    tavily_results: int = 5
+    jitter_ms: float = 100.0
+    seed: int = 0
+    stats: dict = field(
+        default_factory=lambda: {"anthropic_requests": 0, "anthropic_models": {}, "tavily_requests": 0}
+    )
+
+    def __post_init__(self):
+        self.random = random.Random(self.seed)
+
+    async def sleep(self, ms: float):
+        await asyncio.sleep((ms + self.random.uniform(0, self.jitter_ms)) / 1000)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _last_question(messages: list) -> str:
+    """Text of the last user message that is not a tool result."""
+    for message in reversed(messages):
+        if message["role"] != "user":
+            continue
+        content = message["content"]
+        if isinstance(content, str):
+            return content
+        texts = [block.get("text", "") for block in content if block.get("type") == "text"]
+        if texts:
+            return " ".join(texts)
+    return ""
+
+
+def _rounds_done(messages: list) -> int:
+    """Tool-use rounds already completed for the current question."""
+    rounds = 0
+    for message in reversed(messages):
+        content = message["content"]
+        if message["role"] == "user":
+            if isinstance(content, list) and any(b.get("type") == "tool_result" for b in content):
+                rounds += 1
+            else:
+                break
+    return rounds
+
+
+def _plan(config: FakeProviderConfig, body: dict) -> list[dict]:
+    """Content blocks of the next response: tool calls or the final answer."""
+    messages = body.get("messages", [])
+    question = _last_question(messages)
+    rounds = _rounds_done(messages)
+    if body.get("tools") and rounds < config.tool_rounds:
+        blocks = [{"type": "text", "text": "Let me search for that."}]
+        for i in range(config.searches_per_round):
+            blocks.append({
+                "type": "tool_use",
+                "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                "name": "web_search",
+                "input": {"query": f"{question[:80]} ({rounds}.{i})"},
+            })
+        return blocks
+    words = " ".join(f"word{i}" for i in range(config.answer_tokens))
+    return [{"type": "text", "text": words}]
+
+
+def _usage(body: dict, output_tokens: int) -> dict:
+    input_tokens = len(json.dumps(body.get("messages", []))) // 4
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+
+
+def create_anthropic_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        config.stats["anthropic_requests"] += 1
+        body = await request.json()
+        models = config.stats["anthropic_models"]
+        models[body["model"]] = models.get(body["model"], 0) + 1
+        blocks = _plan(config, body)
+        stop_reason = "tool_use" if any(b["type"] == "tool_use" for b in blocks) else "end_turn"
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        output_tokens = sum(len(b.get("text", "").split()) for b in blocks) + 20 * (len(blocks) - 1)
+
+        if not body.get("stream"):
+            await config.sleep(config.anthropic_first_token_ms)
+            await asyncio.sleep(output_tokens / config.anthropic_tokens_per_second)
+            return JSONResponse({
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": body["model"],
+                "content": blocks,
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": _usage(body, output_tokens),
+            })
+
+        async def stream():
+            await config.sleep(config.anthropic_first_token_ms)
+            start = {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": body["model"],
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": _usage(body, 1),
+            }
+            yield _sse("message_start", {"type": "message_start", "message": start})
+            delay = 1 / config.anthropic_tokens_per_second
+            for index, block in enumerate(blocks):
+                if block["type"] == "text":
+                    yield _sse("content_block_start", {
+                        "type": "content_block_start", "index": index,
+                        "content_block": {"type": "text", "text": ""},
+                    })
+                    for word in block["text"].split(" "):
+                        await asyncio.sleep(delay)
+                        yield _sse("content_block_delta", {
+                            "type": "content_block_delta", "index": index,
+                            "delta": {"type": "text_delta", "text": word + " "},
+                        })
+                else:
+                    yield _sse("content_block_start", {
+                        "type": "content_block_start", "index": index,
+                        "content_block": {**block, "input": {}},
+                    })
+                    await asyncio.sleep(20 * delay)
+                    yield _sse("content_block_delta", {
+                        "type": "content_block_delta", "index": index,
+                        "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])},
+                    })
+                yield _sse("content_block_stop", {"type": "content_block_stop", "index": index})
+            yield _sse("message_delta", {
+                "type": "message_delta",
+                "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                "usage": {"output_tokens": output_tokens},
+            })
+            yield _sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def create_tavily_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/search")
+    async def search(request: Request):
+        config.stats["tavily_requests"] += 1
+        body = await request.json()
+        query = body.get("query", "")
+        await config.sleep(config.tavily_latency_ms)
+        digest = hashlib.sha1(query.encode()).hexdigest()
+        count = min(config.tavily_results, body.get("max_results", config.tavily_results))
+        return {
+            "query": query,
+            "results": [
+                {
+                    "url": f"https://example{i}.com/{digest[:12]}",
+                    "title": f"Result {i} for {query}",
+                    "content": f"Snippet {i} about {query}. " * 10,
+                    "score": 1 - i / 10,
+                }
+                for i in range(count)
+            ],
+        }
+
+    return app
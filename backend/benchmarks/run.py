@@ -0,0 +1,301 @@
+"""Load and latency benchmark for the Pantheon backend.
+
+Starts the fake Anthropic and Tavily servers and the backend itself on
+local ports, then drives the chat endpoints at a configurable concurrency
+against the database in DATABASE_URL. Run from the backend directory:
+
+    DATABASE_URL=postgresql://localhost/pantheon_bench \\
+        python -m benchmarks.run --requests 100 --concurrency 10 --output base.json
+
+Compare two result files with ``python -m benchmarks.compare``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from dataclasses import fields
+from datetime import datetime, timezone
+from typing import Optional
+import httpx
+import uvicorn
+from benchmarks.fake_providers import FakeProviderConfig, create_anthropic_app, create_tavily_app
+
+
+def percentiles(values: list[float]) -> Optional[dict]:
+    """Summary of a list of latencies in milliseconds."""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+async def start_server(app) -> tuple[uvicorn.Server, asyncio.Task, str]:
+    """Serve an ASGI app on a free local port."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+async def stop_server(server: uvicorn.Server, task: asyncio.Task):
+    server.should_exit = True
+    await task
+
+
+class PoolSampler:
+    """Samples the database pool's checked-out connections in the background."""
+
+    def __init__(self, engine, interval: float = 0.01):
+        self.pool = engine.pool
+        self.interval = interval
+        self.samples: list[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            self.samples.append(self.pool.checkedout())
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def report(self) -> dict:
+        capacity = self.pool.size() + max(self.pool._max_overflow, 0)
+        samples = self.samples or [0]
+        return {
+            "pool_size": self.pool.size(),
+            "capacity": capacity,
+            "max_checked_out": max(samples),
+            "mean_checked_out": round(sum(samples) / len(samples), 2),
+            "saturated_fraction": round(sum(1 for s in samples if s >= capacity) / len(samples), 4),
+        }
+
+
+async def run_scenario(name: str, requests: int, concurrency: int, engine, fn) -> dict:
+    """Run ``fn(i)`` ``requests`` times at the given concurrency."""
+    results = []
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            results.append(await fn(i))
+
+    print(f"{name}: {requests} requests at concurrency {concurrency}")
+    with PoolSampler(engine) as sampler:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == "ok"]
+    report = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": len(ok),
+        "rejected": sum(1 for r in results if r["status"] == "rejected"),
+        "errors": sum(1 for r in results if r["status"] == "error"),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else None,
+        "latency_ms": percentiles([r["total_ms"] for r in ok]),
+        "db_pool": sampler.report(),
+    }
+    for key in ("ttfe_ms", "ttfc_ms"):
+        values = [r[key] for r in ok if r.get(key) is not None]
+        if values:
+            report[key] = percentiles(values)
+    return report
+
+
+async def send_message(client: httpx.AsyncClient, chat_id: str, question: str) -> dict:
+    """POST a message and time the SSE stream."""
+    started = time.perf_counter()
+    ttfe = ttfc = None
+    status = "error"
+    try:
+        async with client.stream(
+            "POST", f"/api/chats/{chat_id}/messages", json={"content": question}
+        ) as response:
+            if response.status_code == 503:
+                return {"status": "rejected"}
+            if response.status_code != 200:
+                return {"status": "error"}
+            async for line in response.aiter_lines():
+                if not line.startswith("event: "):
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                event = line[len("event: "):]
+                if ttfe is None:
+                    ttfe = elapsed
+                if event == "content" and ttfc is None:
+                    ttfc = elapsed
+                if event == "complete":
+                    status = "ok"
+                elif event == "error":
+                    break
+    except httpx.HTTPError:
+        pass
+    return {
+        "status": status,
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "ttfe_ms": ttfe,
+        "ttfc_ms": ttfc,
+    }
+
+
+async def timed_get(client: httpx.AsyncClient, url: str, params: dict = None) -> dict:
+    started = time.perf_counter()
+    try:
+        response = await client.get(url, params=params)
+        status = "ok" if response.status_code == 200 else "error"
+    except httpx.HTTPError:
+        status = "error"
+    return {"status": status, "total_ms": (time.perf_counter() - started) * 1000}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args, provider_config: FakeProviderConfig):
+    anthropic_server = await start_server(create_anthropic_app(provider_config))
+    tavily_server = await start_server(create_tavily_app(provider_config))
+
+    # Settings are read once at import time, so point the backend at the
+    # stand-ins before importing it
+    os.environ["ANTHROPIC_BASE_URL"] = anthropic_server[2]
+    os.environ["TAVILY_BASE_URL"] = tavily_server[2]
+    os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+    if not args.search_cache:
+        os.environ["SEARCH_CACHE_ENABLED"] = "false"
+    from app.config import get_settings
+    from app.database import engine
+    from app.main import app
+
+    backend_server = await start_server(app)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    client = httpx.AsyncClient(base_url=backend_server[2], timeout=args.timeout, limits=limits)
+    scenarios = {}
+    try:
+        chat_ids = []
+        for _ in range(args.chats):
+            response = await client.post("/api/chats", json={})
+            response.raise_for_status()
+            chat_ids.append(response.json()["id"])
+
+        scenarios["send_message"] = await run_scenario(
+            "send_message", args.requests, args.concurrency, engine,
+            lambda i: send_message(
+                client, chat_ids[i % len(chat_ids)], f"Benchmark question {i}: what changed in topic {i % 50}?"
+            ),
+        )
+        scenarios["list_chats"] = await run_scenario(
+            "list_chats", args.read_requests, args.concurrency, engine,
+            lambda i: timed_get(client, "/api/chats", {"limit": 50}),
+        )
+        scenarios["get_chat"] = await run_scenario(
+            "get_chat", args.read_requests, args.concurrency, engine,
+            lambda i: timed_get(client, f"/api/chats/{chat_ids[i % len(chat_ids)]}"),
+        )
+    finally:
+        await client.aclose()
+        await stop_server(*backend_server[:2])
+        await stop_server(*anthropic_server[:2])
+        await stop_server(*tavily_server[:2])
+
+    settings = get_settings()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests,
+            "read_requests": args.read_requests,
+            "concurrency": args.concurrency,
+            "chats": args.chats,
+            "search_cache": args.search_cache,
+            "providers": {f.name: getattr(provider_config, f.name) for f in fields(provider_config) if f.name != "stats"},
+            "db_pool_size": settings.db_pool_size,
+            "db_max_overflow": settings.db_max_overflow,
+            "max_concurrent_runs": settings.max_concurrent_runs,
+        },
+        "provider_requests": provider_config.stats,
+        "scenarios": scenarios,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pantheon backend load and latency benchmark")
+    parser.add_argument("--requests", type=int, default=50, help="messages to send")
+    parser.add_argument("--read-requests", type=int, default=200, help="requests per read scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--chats", type=int, default=10, help="chats the messages are spread over")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--search-cache", action="store_true", help="leave the search cache on")
+    parser.add_argument("--output", default="benchmark.json")
+    defaults = FakeProviderConfig()
+    for f in fields(FakeProviderConfig):
+        if f.name == "stats":
+            continue
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(getattr(defaults, f.name)),
+                            default=getattr(defaults, f.name))
+    return parser.parse_args()
+
+
+def print_summary(result: dict):
+    for name, scenario in result["scenarios"].items():
+        latency = scenario["latency_ms"] or {}
+        line = (
+            f"{name:<14} ok={scenario['ok']:<5} rejected={scenario['rejected']:<4} "
+            f"errors={scenario['errors']:<4} rps={scenario['throughput_rps']:<8} "
+            f"p50={latency.get('p50')}ms p95={latency.get('p95')}ms p99={latency.get('p99')}ms"
+        )
+        if "ttfe_ms" in scenario:
+            line += f" ttfe_p50={scenario['ttfe_ms']['p50']}ms"
+        if "ttfc_ms" in scenario:
+            line += f" ttfc_p50={scenario['ttfc_ms']['p50']}ms"
+        pool = scenario["db_pool"]
+        line += f" pool_max={pool['max_checked_out']}/{pool['capacity']} saturated={pool['saturated_fraction']:.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    provider_config = FakeProviderConfig(**{
+        f.name: getattr(args, f.name) for f in fields(FakeProviderConfig) if f.name != "stats"
+    })
+    result = asyncio.run(main(args, provider_config))
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print_summary(result)
+    print(f"Results written to {args.output}")
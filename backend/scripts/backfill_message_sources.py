@@ -0,0 +1,60 @@
+"""Backfill the normalized sources tables from messages.sources JSONB.
+
+Run from the backend directory after applying migration 004:
+
+    python -m scripts.backfill_message_sources [--batch-size 500]
+
+Messages are processed in sequence order, one transaction per batch. Each
+backfilled message has its JSONB copy cleared, so the script can be stopped
+and re-run safely.
+"""
+import argparse
+import asyncio
+from sqlalchemy import select, update
+from app.database import async_session_maker, engine
+from app.models.database import Message
+from app.services.chat_service import ChatService
+
+
+async def backfill_batch(session, after_sequence: int, batch_size: int) -> tuple[int, int]:
+    """Backfill one batch of messages. Returns (messages, last sequence_num)."""
+    result = await session.execute(
+        select(Message.id, Message.sources, Message.sequence_num)
+        .where(Message.sequence_num > after_sequence)
+        .where(Message.sources != [])
+        .order_by(Message.sequence_num)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return 0, after_sequence
+
+    await ChatService(session).link_sources([(row.id, row.sources) for row in rows])
+    await session.execute(
+        update(Message)
+        .where(Message.id.in_([row.id for row in rows]))
+        .values(sources=[])
+    )
+    return len(rows), rows[-1].sequence_num
+
+
+async def main(batch_size: int):
+    total = 0
+    after_sequence = 0
+    while True:
+        async with async_session_maker() as session:
+            count, after_sequence = await backfill_batch(session, after_sequence, batch_size)
+            await session.commit()
+        if not count:
+            break
+        total += count
+        print(f"Backfilled {total} messages (through sequence {after_sequence})")
+    await engine.dispose()
+    print(f"Done: {total} messages backfilled")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
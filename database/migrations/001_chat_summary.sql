@@ -0,0 +1,3 @@
+-- Rolling summary of older turns, used to bound the agent's context
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary_through_seq INTEGER;
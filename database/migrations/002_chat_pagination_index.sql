@@ -0,0 +1,2 @@
+-- Keyset pagination of the chat list on (updated_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chats_updated_at_id ON chats(updated_at DESC, id DESC);
@@ -0,0 +1,11 @@
+-- Full-text search over message content and chat titles.
+-- Adding a stored generated column rewrites the table; run during a quiet period.
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+ALTER TABLE chats
+    ADD COLUMN IF NOT EXISTS title_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(title, ''))) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_search_vector ON messages USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chats_title_vector ON chats USING GIN (title_vector);
@@ -0,0 +1,21 @@
+-- Normalized sources: one row per canonical URL, linked to messages in order.
+-- Existing messages keep reading from messages.sources until they are
+-- backfilled with `python -m scripts.backfill_message_sources` (run from backend/).
+CREATE TABLE IF NOT EXISTS sources (
+    id BIGSERIAL PRIMARY KEY,
+    canonical_url TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    domain VARCHAR(255) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS message_sources (
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    source_id BIGINT NOT NULL REFERENCES sources(id),
+    snippet TEXT,
+    PRIMARY KEY (message_id, position)
+);
+
+CREATE INDEX IF NOT EXISTS idx_message_sources_source_id ON message_sources(source_id);
@@ -0,0 +1,8 @@
+-- Marks assistant replies cut short because the client went away.
+-- A constant default does not rewrite the table.
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'complete';
+ALTER TABLE messages DROP CONSTRAINT IF EXISTS check_status;
+ALTER TABLE messages
+    ADD CONSTRAINT check_status CHECK (status IN ('complete', 'aborted')) NOT VALID;
+ALTER TABLE messages VALIDATE CONSTRAINT check_status;
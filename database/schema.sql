@@ -7,8 +7,11 @@ CREATE EXTENSION IF NOT EXISTS "pgcrypto";
 CREATE TABLE chats (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     title VARCHAR(255),
+    summary TEXT,
+    summary_through_seq INTEGER,
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    updated_at TIMESTAMPTZ DEFAULT NOW()
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    title_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(title, ''))) STORED
 );
 
 -- Messages table
@@ -19,8 +22,10 @@ CREATE TABLE messages (
     content TEXT NOT NULL,
     thinking_steps JSONB DEFAULT '[]',
     sources JSONB DEFAULT '[]',
+    status VARCHAR(20) NOT NULL DEFAULT 'complete' CONSTRAINT check_status CHECK (status IN ('complete', 'aborted')),
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    sequence_num SERIAL
+    sequence_num SERIAL,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
 );
 
 -- Index for faster message lookups by chat
@@ -29,6 +34,47 @@ CREATE INDEX idx_messages_chat_id ON messages(chat_id);
 -- Index for ordering messages
 CREATE INDEX idx_messages_sequence ON messages(chat_id, sequence_num);
 
+-- Full-text search over message content and chat titles
+CREATE INDEX idx_messages_search_vector ON messages USING GIN (search_vector);
+CREATE INDEX idx_chats_title_vector ON chats USING GIN (title_vector);
+
+-- Index for keyset pagination of the chat list
+CREATE INDEX idx_chats_updated_at_id ON chats(updated_at DESC, id DESC);
+
+-- Persistent tier of the web search result cache
+CREATE TABLE search_cache (
+    key VARCHAR(64) PRIMARY KEY,
+    query TEXT NOT NULL,
+    results JSONB NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Index for purging expired cache entries
+CREATE INDEX idx_search_cache_expires_at ON search_cache(expires_at);
+
+-- Cited web pages, stored once per canonical URL
+CREATE TABLE sources (
+    id BIGSERIAL PRIMARY KEY,
+    canonical_url TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    domain VARCHAR(255) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Ordered sources of each message
+CREATE TABLE message_sources (
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    source_id BIGINT NOT NULL REFERENCES sources(id),
+    snippet TEXT,
+    PRIMARY KEY (message_id, position)
+);
+
+-- Index for the foreign key to sources
+CREATE INDEX idx_message_sources_source_id ON message_sources(source_id);
+
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$